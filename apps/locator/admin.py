@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib import admin, messages
+from .models import MachineTypeProfile, ProfileTag, CategoryLabel, ImportedRegion, Place
+from .poi_tiles import kept_tag_keys
+# Connects the signals that recompile the profile registry after admin edits
+from . import profiles  # noqa: F401
+
+class ProfileTagInline(admin.TabularInline):
+    model = ProfileTag
+    extra = 1
+
+@admin.register(MachineTypeProfile)
+class MachineTypeProfileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'is_active', 'is_default', 'display_order']
+    list_filter = ['is_active', 'is_default']
+    list_editable = ['is_active', 'display_order']
+    search_fields = ['name']
+    inlines = [ProfileTagInline]
+
+@admin.register(CategoryLabel)
+class CategoryLabelAdmin(admin.ModelAdmin):
+    list_display = ['key', 'value', 'label', 'priority']
+    list_editable = ['label', 'priority']
+    search_fields = ['key', 'value', 'label']
+    
+    def save_model(self, request, obj, form, change):
+        # Cached tiles pick up a new key on their own, imported regions only kept the keys of their day
+        new_key = obj.key not in kept_tag_keys()
+        super().save_model(request, obj, form, change)
+        if new_key and getattr(settings, 'LOCATOR_POI_BACKEND', 'overpass') == 'local' and ImportedRegion.objects.exists():
+            messages.warning(
+                request,
+                f"Imported OSM regions don't keep the '{obj.key}' tag yet. "
+                f"Re-run import_osm_extract for this label to apply to them."
+            )
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ['name', 'category', 'key', 'updated_at']
+    list_filter = ['category']
+    search_fields = ['name', 'key', 'address']
+    readonly_fields = ['key', 'osm_type', 'osm_id', 'geohash', 'updated_at']
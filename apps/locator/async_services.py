@@ -0,0 +1,104 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from vending_locator.cache_keys import cache_key
+
+from .catalog import fill_known_addresses
+from .geocode_cache import reverse_geocode_cache
+from .poi_store import afetch_pois
+from .services import LocationFinderService
+from .upstream import async_nominatim
+from .zip_index import get_zip_index
+
+
+class AsyncLocationFinderService(LocationFinderService):
+    """LocationFinderService for the ASGI search path, with non-blocking upstream calls"""
+
+    async def aresolve_zip_code(self, zip_code: str) -> Optional[Tuple[float, float]]:
+        """Async version of resolve_zip_code"""
+        index = get_zip_index()
+        if index is not None:
+            coords = index.lookup(zip_code)
+            if coords:
+                return coords
+
+        zip_key = cache_key('locator', 'zip', zip_code)
+        cached = await cache.aget(zip_key)
+        if cached is not None:
+            return tuple(cached) if cached else None
+
+        try:
+            response = await async_nominatim.get('search', params=self._zip_search_params(zip_code), timeout=15)
+            response.raise_for_status()
+
+            coords = self._coords_from_search(response.json())
+            await cache.aset(zip_key, coords or False, self._zip_cache_ttl(coords))
+            return coords
+
+        except Exception as e:
+            print(f"Zip code lookup error: {str(e)}")
+            return None
+
+    async def afind_nearby_places(self, lat: float, lon: float, machine_type: str, radius_miles: int = 5) -> List[Dict]:
+        """Async version of find_nearby_places"""
+        try:
+            radius = radius_miles * 1609
+            # Profiles may need compiling from the database, which can't happen on the event loop
+            place_types = await sync_to_async(self._get_place_types)(machine_type)
+
+            buckets = await afetch_pois(place_types, lat, lon, radius)
+
+            places = await sync_to_async(self._select_places)(buckets, place_types, machine_type, lat, lon, radius)
+            if not places:
+                return await sync_to_async(self._fallback_search, thread_sensitive=False)(lat, lon)
+
+            # Foot traffic is one blocking batch query, run it off the loop alongside the addresses
+            await asyncio.gather(
+                self._aresolve_addresses(places),
+                sync_to_async(self._estimate_foot_traffic, thread_sensitive=False)(places)
+            )
+            return self._rank_places(places, lat, lon, radius)
+
+        except Exception as e:
+            print(f"Find nearby places error: {str(e)}")
+            return await sync_to_async(self._fallback_search, thread_sensitive=False)(lat, lon)
+
+    async def _aresolve_addresses(self, places: List[Dict]) -> None:
+        """Fill in addresses from the place catalog, reverse geocoding the rest concurrently"""
+        unknown = await sync_to_async(fill_known_addresses, thread_sensitive=False)(places)
+        semaphore = asyncio.Semaphore(getattr(settings, 'NOMINATIM_MAX_WORKERS', 4))
+
+        async def resolve(place):
+            async with semaphore:
+                place['address'] = await self._aget_address_from_coords(place['lat'], place['lon'])
+
+        await asyncio.gather(*(resolve(place) for place in unknown))
+
+    async def _aget_address_from_coords(self, lat: float, lon: float) -> str:
+        """Async version of _get_address_from_coords"""
+        cached = await sync_to_async(reverse_geocode_cache.get, thread_sensitive=False)(lat, lon)
+        if cached is not None:
+            return cached
+
+        try:
+            params = {
+                'lat': lat,
+                'lon': lon,
+                'format': 'json'
+            }
+
+            response = await async_nominatim.get('reverse', params=params, timeout=10)
+            response.raise_for_status()
+
+            address = response.json().get('display_name')
+            if not address:
+                return 'Address not available'
+
+            await sync_to_async(reverse_geocode_cache.set, thread_sensitive=False)(lat, lon, address)
+            return address
+
+        except Exception:
+            return 'Address not available'
@@ -0,0 +1,152 @@
+"""
+Catalog of places shared by every search.
+
+Each place a search returns is stored once as a Place, keyed by its OSM
+element ('n123', 'w456') or, for places without one, by its geohash cell and
+name, and updated in place when a later search sees it again. Searches link
+to it through thin LocationData rows, and take the address of a place the
+catalog already knows instead of reverse geocoding it again.
+"""
+import hashlib
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+
+from .geo import geohash_encode
+from .models import LOCATION_GEOHASH_PRECISION, Place
+
+# Addresses that are placeholders, never stored over a real one nor handed out from the catalog
+UNRESOLVED_ADDRESS = 'Address not available'
+
+OSM_TYPE_CODES = {'node': 'n', 'way': 'w', 'relation': 'r'}
+
+# Kept on place dicts for the catalog and ranking, never sent to clients
+INTERNAL_FIELDS = ('key', 'tags', 'weight')
+
+UPDATED_FIELDS = ('name', 'category', 'address', 'latitude', 'longitude', 'geohash',
+                  'phone', 'email', 'business_hours', 'tags')
+
+
+def element_key(osm_type: str, osm_id) -> Optional[str]:
+    """'n123' for node 123, from either a type code or an Overpass/Nominatim type name"""
+    code = OSM_TYPE_CODES.get(osm_type, osm_type)
+    if code not in OSM_TYPE_CODES.values() or osm_id in (None, ''):
+        return None
+    return f"{code}{osm_id}"
+
+
+def synthetic_key(lat: float, lon: float, name: str) -> str:
+    """Key for places without an OSM id: the same name in the same ~38m cell is the same place"""
+    name_hash = hashlib.sha1(name.strip().lower().encode()).hexdigest()[:16]
+    return f"x:{geohash_encode(lat, lon, LOCATION_GEOHASH_PRECISION)}:{name_hash}"
+
+
+def place_key(place: Dict) -> str:
+    return place.get('key') or synthetic_key(place['lat'], place['lon'], place['name'])
+
+
+def is_resolved(address: Optional[str]) -> bool:
+    return bool(address) and address != UNRESOLVED_ADDRESS and not address.startswith('Near ')
+
+
+def fill_known_addresses(places: List[Dict]) -> List[Dict]:
+    """Copy catalog addresses into places without one, returning those the catalog doesn't know"""
+    pending = [place for place in places if not place.get('address')]
+    if not pending:
+        return []
+
+    try:
+        known = dict(
+            Place.objects.filter(key__in={place_key(place) for place in pending})
+            .exclude(address=UNRESOLVED_ADDRESS)
+            .values_list('key', 'address')
+        )
+    except Exception as e:
+        print(f"Place catalog error: {str(e)}")
+        return pending
+
+    unknown = []
+    for place in pending:
+        address = known.get(place_key(place))
+        if is_resolved(address):
+            place['address'] = address
+        else:
+            unknown.append(place)
+    return unknown
+
+
+def _place_fields(place: Dict) -> Dict:
+    return {
+        'name': place['name'][:255],
+        'category': place['category'][:100],
+        'address': place.get('address') or UNRESOLVED_ADDRESS,
+        'latitude': place['lat'],
+        'longitude': place['lon'],
+        'geohash': geohash_encode(place['lat'], place['lon'], LOCATION_GEOHASH_PRECISION),
+        'phone': (place.get('phone') or '')[:50],
+        'email': place.get('email') or '',
+        'business_hours': (place.get('business_hours') or '')[:200],
+        'tags': place.get('tags') or {},
+    }
+
+
+def upsert_places(places: List[Dict]) -> Dict[str, Place]:
+    """Create or refresh the catalog entries of places, returning them by key"""
+    fields_by_key = {}
+    for place in places:
+        fields_by_key.setdefault(place_key(place), _place_fields(place))
+    if not fields_by_key:
+        return {}
+
+    existing = Place.objects.in_bulk(list(fields_by_key), field_name='key')
+
+    missing = []
+    for key, fields in fields_by_key.items():
+        if key not in existing:
+            code = key[0] if key[0] in OSM_TYPE_CODES.values() else ''
+            missing.append(Place(key=key, osm_type=code, osm_id=int(key[1:]) if code else None, **fields))
+
+    changed = []
+    now = timezone.now()
+    for key, place in existing.items():
+        fields = fields_by_key[key]
+        if not is_resolved(fields['address']) and is_resolved(place.address):
+            # A failed lookup this time doesn't erase the address found last time
+            fields = dict(fields, address=place.address)
+        if any(getattr(place, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(place, name, value)
+            place.updated_at = now
+            changed.append(place)
+
+    if changed:
+        # bulk_update skips auto_now, so updated_at is set above
+        Place.objects.bulk_update(changed, UPDATED_FIELDS + ('updated_at',))
+    if missing:
+        # Another search may insert the same place meanwhile; either row will do
+        Place.objects.bulk_create(missing, ignore_conflicts=True)
+        existing.update(Place.objects.in_bulk([place.key for place in missing], field_name='key'))
+
+    return existing
+
+
+def place_dict(place: Place, foot_traffic: str) -> Dict:
+    """A catalog place in the shape searches return"""
+    return {
+        'key': place.key,
+        'name': place.name,
+        'category': place.category,
+        'address': place.address,
+        'lat': place.latitude,
+        'lon': place.longitude,
+        'phone': place.phone,
+        'email': place.email,
+        'business_hours': place.business_hours,
+        'foot_traffic': foot_traffic,
+        'tags': place.tags,
+    }
+
+
+def public_place(place: Dict) -> Dict:
+    """A place in the shape search responses send, without its internal fields"""
+    return {name: value for name, value in place.items() if name not in INTERNAL_FIELDS}
@@ -0,0 +1,69 @@
+"""
+Duplicate detection for Overpass candidates.
+
+The same venue often comes back several times: under more than one tag
+filter, or as both a node and a building way with slightly different
+names. Candidates are grouped by a normalized name, and two of them are
+the same place only when they are also within a short distance of each
+other, so branches of a chain across town stay separate. Each name keeps
+its own spatial grid, which keeps the whole pass linear.
+"""
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+from .geo import SpatialGrid
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_POSSESSIVE = re.compile(r"['’]s\b")
+_IGNORED_WORDS = {'the', 'and'}
+
+
+def normalize_name(name: str) -> str:
+    """Fold case, accents, punctuation and filler words so name variants compare equal"""
+    folded = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    folded = _POSSESSIVE.sub('s', folded.replace('&', ' and '))
+    words = [word for word in _NON_ALNUM.split(folded) if word and word not in _IGNORED_WORDS]
+    return ''.join(words)
+
+
+def dedupe_elements(elements: List[Dict], max_distance_m: float) -> List[Tuple[int, Dict]]:
+    """
+    Collapse elements with the same normalized name within max_distance_m of each other.
+
+    Returns (index, tags) for the first element of every group, with the tags of its
+    duplicates merged in for any keys it was missing.
+    """
+    if not elements:
+        return []
+
+    reference_lat = _coords(elements[0])[0]
+    grids = {}
+    kept = []
+
+    for index, element in enumerate(elements):
+        tags = element.get('tags', {})
+        lat, lon = _coords(element)
+        key = normalize_name(tags.get('name', '')) or f"#{index}"
+
+        grid = grids.get(key)
+        if grid is None:
+            grid = grids[key] = SpatialGrid(max_distance_m, reference_lat)
+
+        match = next(grid.nearby(lat, lon, max_distance_m), None)
+        if match is not None:
+            merged = kept[match[2]][1]
+            for tag, value in tags.items():
+                merged.setdefault(tag, value)
+            continue
+
+        grid.insert(lat, lon, len(kept))
+        kept.append((index, dict(tags)))
+
+    return kept
+
+
+def _coords(element: Dict) -> Tuple[float, float]:
+    if 'lat' in element:
+        return element['lat'], element['lon']
+    return element['center']['lat'], element['center']['lon']
@@ -0,0 +1,128 @@
+"""Small geographic helpers shared by the locator services"""
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_M = 6371000
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 8) -> str:
+    """Encode coordinates as a geohash string of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_cells_for_bbox(bbox, precision: int):
+    """List the geohash cells of the given length that intersect a (south, west, north, east) box"""
+    south, west, north, east = bbox
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    cell_lat = 180.0 / 2 ** lat_bits
+    cell_lon = 360.0 / 2 ** lon_bits
+
+    cells = []
+    for row in range(math.floor((south + 90) / cell_lat), math.floor((north + 90) / cell_lat) + 1):
+        for col in range(math.floor((west + 180) / cell_lon), math.floor((east + 180) / cell_lon) + 1):
+            # Encode the cell's center so float edges can't land in a neighbour
+            cells.append(geohash_encode(-90 + (row + 0.5) * cell_lat, -180 + (col + 0.5) * cell_lon, precision))
+    return cells
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat: float, lon: float, radius_m: float):
+    """Return (south, west, north, east) of the box enclosing a circle"""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 0.01)))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def tile_for(lat: float, lon: float, tile_size: float):
+    """Return the (row, col) id of the fixed grid tile containing a point"""
+    return math.floor(lat / tile_size), math.floor(lon / tile_size)
+
+
+def tiles_for_bbox(bbox, tile_size: float):
+    """List the grid tiles intersecting a (south, west, north, east) box"""
+    south, west, north, east = bbox
+    row_min, col_min = tile_for(south, west, tile_size)
+    row_max, col_max = tile_for(north, east, tile_size)
+    return [
+        (row, col)
+        for row in range(row_min, row_max + 1)
+        for col in range(col_min, col_max + 1)
+    ]
+
+
+def tile_bbox(tile, tile_size: float):
+    """Return the (south, west, north, east) bounds of a grid tile"""
+    row, col = tile
+    return row * tile_size, col * tile_size, (row + 1) * tile_size, (col + 1) * tile_size
+
+
+class SpatialGrid:
+    """Buckets points into square cells so radius queries only scan nearby cells"""
+
+    def __init__(self, cell_m: float, reference_lat: float):
+        self.cell_lat = math.degrees(cell_m / EARTH_RADIUS_M)
+        self.cell_lon = math.degrees(cell_m / (EARTH_RADIUS_M * max(math.cos(math.radians(reference_lat)), 0.01)))
+        self._cells = {}
+
+    def _cell(self, lat: float, lon: float):
+        return math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon)
+
+    def insert(self, lat: float, lon: float, item=None) -> None:
+        self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, item))
+
+    def nearby(self, lat: float, lon: float, radius_m: float):
+        """Yield (lat, lon, item) for every point within radius_m of (lat, lon)"""
+        row, col = self._cell(lat, lon)
+        reach_rows = math.ceil(math.degrees(radius_m / EARTH_RADIUS_M) / self.cell_lat)
+        reach_cols = math.ceil(
+            math.degrees(radius_m / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 0.01))) / self.cell_lon
+        )
+        for r in range(row - reach_rows, row + reach_rows + 1):
+            for c in range(col - reach_cols, col + reach_cols + 1):
+                for point in self._cells.get((r, c), ()):
+                    if haversine_m(lat, lon, point[0], point[1]) <= radius_m:
+                        yield point
+
+    def count_within(self, lat: float, lon: float, radius_m: float) -> int:
+        return sum(1 for _ in self.nearby(lat, lon, radius_m))
@@ -0,0 +1,97 @@
+"""
+Two-tier cache for reverse geocoded addresses.
+
+Keys are coordinates quantized to a geohash cell, so the same venue found
+by different searches maps to the same entry. Lookups go to a per-process
+LRU first and then to Django's cache framework, which is shared between
+workers when a shared backend is configured.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from vending_locator.cache_keys import cache_key
+
+from .geo import geohash_encode
+
+
+class ReverseGeocodeCache:
+    def __init__(self, precision: int, ttl: int, max_entries: int):
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def key_for(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    def get(self, lat: float, lon: float) -> Optional[str]:
+        """Return the cached address for the cell containing (lat, lon), if any"""
+        key = self.key_for(lat, lon)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                address, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.local_hits += 1
+                    return address
+                del self._entries[key]
+
+        address = cache.get(self._shared_key(key))
+        if address is not None:
+            self._remember(key, address)
+            with self._lock:
+                self.shared_hits += 1
+            return address
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, lat: float, lon: float, address: str) -> None:
+        key = self.key_for(lat, lon)
+        self._remember(key, address)
+        cache.set(self._shared_key(key), address, self.ttl)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            hits = self.local_hits + self.shared_hits
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def _remember(self, key: str, address: str) -> None:
+        with self._lock:
+            self._entries[key] = (address, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _shared_key(self, key: str) -> str:
+        return cache_key('locator', 'revgeo', self.precision, key)
+
+
+reverse_geocode_cache = ReverseGeocodeCache(
+    precision=getattr(settings, 'REVERSE_GEOCODE_CACHE_PRECISION', 8),
+    ttl=getattr(settings, 'REVERSE_GEOCODE_CACHE_TTL', 60 * 60 * 24 * 30),
+    max_entries=getattr(settings, 'REVERSE_GEOCODE_CACHE_MAX_ENTRIES', 5000),
+)
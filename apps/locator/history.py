@@ -0,0 +1,101 @@
+"""
+Keyset pagination over a user's search history.
+
+Pages are ordered newest first on (created_at, id) and continue from an
+opaque cursor holding the last row's key, so fetching page 500 costs the
+same index range scan as page 1. Stored locations, joined to their catalog
+places, are loaded for a whole page in one batched query, or for a single
+search on demand.
+"""
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Prefetch, Q
+
+from .models import LocationData, SearchHistory
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+LOCATION_FIELDS = (
+    'id', 'search_history_id', 'foot_traffic', 'place__name', 'place__category', 'place__address',
+    'place__latitude', 'place__longitude', 'place__phone', 'place__email', 'place__business_hours',
+)
+
+
+def encode_cursor(search: SearchHistory) -> str:
+    raw = f"{search.created_at.isoformat()}|{search.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Return (created_at, id) from a cursor, or None if it's malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, search_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(search_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def history_page(user, cursor: Optional[str] = None, page_size: int = PAGE_SIZE,
+                 with_locations: bool = False) -> Tuple[List[SearchHistory], Optional[str]]:
+    """One page of a user's searches, newest first, and the cursor for the next page (None on the last)"""
+    searches = SearchHistory.objects.filter(user=user).order_by('-created_at', '-id')
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, search_id = position
+        searches = searches.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=search_id))
+
+    if with_locations:
+        searches = searches.prefetch_related(Prefetch(
+            'locationdata_set',
+            queryset=LocationData.objects.select_related('place').only(*LOCATION_FIELDS).order_by('id')
+        ))
+
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = list(searches[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def serialize_location(location: LocationData) -> Dict:
+    place = location.place
+    return {
+        'name': place.name,
+        'category': place.category,
+        'address': place.address,
+        'lat': place.latitude,
+        'lon': place.longitude,
+        'phone': place.phone,
+        'email': place.email,
+        'business_hours': place.business_hours,
+        'foot_traffic': location.foot_traffic,
+    }
+
+
+def serialize_search(search: SearchHistory, with_locations: bool = False) -> Dict:
+    data = {
+        'id': search.id,
+        'created_at': search.created_at.isoformat(),
+        'zip_code': search.zip_code,
+        'machine_type': search.machine_type,
+        'radius': search.radius,
+        'results_count': search.results_count,
+    }
+    if with_locations:
+        data['locations'] = [serialize_location(location) for location in search.locationdata_set.all()]
+    return data
+
+
+def search_locations_for(user, search_id: int) -> Optional[List[Dict]]:
+    """Stored locations of one of the user's searches, or None if it isn't theirs"""
+    if not SearchHistory.objects.filter(id=search_id, user=user).exists():
+        return None
+    locations = (
+        LocationData.objects.filter(search_history_id=search_id)
+        .select_related('place').only(*LOCATION_FIELDS).order_by('id')
+    )
+    return [serialize_location(location) for location in locations]
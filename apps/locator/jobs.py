@@ -0,0 +1,204 @@
+"""
+Database-backed queue for background location searches.
+
+The web request only inserts a SearchJob row. Worker processes started by
+``manage.py run_search_workers`` claim queued jobs with a conditional UPDATE,
+so any number of workers can share the table without extra services, then
+run the search, store its results and charge the subscription.
+
+A job that runs past SEARCH_JOB_TIMEOUT is failed by fail_stale_jobs while
+its worker may still be running. Every later write from that worker is
+conditional on the job still running, and the search charge is settled by
+whichever side flips SearchJob.holds_charge first: the worker keeps it by
+finishing the job, fail_stale_jobs refunds it by failing the job.
+"""
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.subscriptions.models import UserSubscription
+from .catalog import public_place
+from .models import SearchJob
+from .services import (
+    LocationFinderService, SearchLimitReached, SearchReservation, recent_search_results, record_search
+)
+
+STALE_JOB_ERROR = 'The search took too long. Please try again.'
+
+
+def submit_search_job(user, zip_code: str, machine_type: str, radius: int) -> SearchJob:
+    """Queue a search for the workers, returns the new job"""
+    return SearchJob.objects.create(
+        user=user,
+        zip_code=zip_code,
+        machine_type=machine_type,
+        radius=radius,
+        stage='Waiting for a worker'
+    )
+
+
+def claim_next_job(worker_name: str) -> Optional[SearchJob]:
+    """Atomically take the oldest queued job, returns None when the queue is empty"""
+    candidates = SearchJob.objects.filter(status=SearchJob.STATUS_QUEUED).order_by('created_at')
+    for job_id in candidates.values_list('id', flat=True)[:5]:
+        claimed = SearchJob.objects.filter(id=job_id, status=SearchJob.STATUS_QUEUED).update(
+            status=SearchJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            worker=worker_name,
+            stage='Starting search',
+            progress=5
+        )
+        if claimed:
+            return SearchJob.objects.select_related('user').get(id=job_id)
+    return None
+
+
+def fail_stale_jobs() -> int:
+    """Fail running jobs whose worker died or stalled, refunding their charge; returns how many were failed"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'SEARCH_JOB_TIMEOUT', 600))
+    stale = SearchJob.objects.filter(status=SearchJob.STATUS_RUNNING, started_at__lt=cutoff)
+
+    failed = 0
+    for job_id, user_id in stale.values_list('id', 'user_id'):
+        if not SearchJob.objects.filter(id=job_id, status=SearchJob.STATUS_RUNNING).update(
+            status=SearchJob.STATUS_FAILED,
+            error=STALE_JOB_ERROR,
+            finished_at=timezone.now()
+        ):
+            continue
+        failed += 1
+        if _release_charge(job_id):
+            try:
+                UserSubscription.objects.with_usage().get(user_id=user_id).refund_search()
+            except UserSubscription.DoesNotExist:
+                pass
+    return failed
+
+
+def run_search_job(job: SearchJob) -> None:
+    """Run a claimed job to completion, recording the outcome on the job row"""
+    try:
+        _run(job)
+    except _JobError as e:
+        _finish(job, SearchJob.STATUS_FAILED, error=str(e))
+    except Exception as e:
+        _finish(job, SearchJob.STATUS_FAILED, error=f'An error occurred: {str(e)}')
+    finally:
+        close_old_connections()
+
+
+class _JobError(Exception):
+    pass
+
+
+class JobReservation(SearchReservation):
+    """SearchReservation whose charge is held by the job row until the job finishes or is failed"""
+
+    def __init__(self, job: SearchJob, subscription):
+        super().__init__(subscription)
+        self.job = job
+
+    def __enter__(self):
+        super().__enter__()
+        if not SearchJob.objects.filter(id=self.job.id, status=SearchJob.STATUS_RUNNING).update(holds_charge=True):
+            # Failed as stale before the charge could be recorded on it
+            self.subscription.refund_search()
+            raise _JobError(STALE_JOB_ERROR)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.recorded and _release_charge(self.job.id):
+            self.subscription.refund_search()
+        return False
+
+    def finish(self, places: list, reused: bool, fallback: bool = False) -> None:
+        """Store the results and mark the job done in one transaction, unless it was failed meanwhile"""
+        job = self.job
+        with transaction.atomic():
+            search_history = record_search(
+                job.user, job.zip_code, job.machine_type, places, job.radius, reused=reused, fallback=fallback
+            )
+            fields = {
+                'status': SearchJob.STATUS_DONE,
+                'progress': 100,
+                'stage': '',
+                'finished_at': timezone.now(),
+                'search_history': search_history,
+                'result': {
+                    'places': [public_place(place) for place in places],
+                    'searches_remaining': self.subscription.plan.searches_per_month - self.subscription.searches_used
+                }
+            }
+            if not SearchJob.objects.filter(
+                id=job.id, status=SearchJob.STATUS_RUNNING, holds_charge=True
+            ).update(holds_charge=False, **fields):
+                # fail_stale_jobs got here first and refunded the charge, drop the results with it
+                raise _JobError(STALE_JOB_ERROR)
+        self.recorded = True
+        for name, value in fields.items():
+            setattr(job, name, value)
+
+
+def _release_charge(job_id: int) -> bool:
+    """Take the job's charge back from it, True for the one caller that gets to refund it"""
+    return bool(SearchJob.objects.filter(id=job_id, holds_charge=True).update(holds_charge=False))
+
+
+def _run(job: SearchJob) -> None:
+    try:
+        subscription = UserSubscription.objects.with_usage().select_related('plan').get(user=job.user)
+    except UserSubscription.DoesNotExist:
+        raise _JobError('No active subscription found. Please subscribe to a plan.')
+    if not subscription.can_search():
+        raise _JobError('Search limit reached or subscription expired. Please upgrade your plan.')
+
+    # Charged up front so concurrent jobs can't overspend, refunded if the search fails
+    try:
+        with JobReservation(job, subscription) as reservation:
+            places = recent_search_results(job.zip_code, job.machine_type, job.radius)
+            reused, fallback = places is not None, False
+            if not reused:
+                places, fallback = _find_places(job)
+
+            _report(job, 'Saving results', 97)
+            reservation.finish(places, reused, fallback)
+    except SearchLimitReached as e:
+        raise _JobError(str(e))
+
+
+def _find_places(job: SearchJob) -> Tuple[list, bool]:
+    """The job's places, and whether they came from the fallback search"""
+    finder = LocationFinderService()
+
+    _report(job, 'Locating ZIP code', 10)
+    coords = finder.resolve_zip_code(job.zip_code)
+    if not coords:
+        raise _JobError('Zip code not found. Please enter a valid US zip code.')
+
+    lat, lon = coords
+    places = finder.find_nearby_places(
+        lat, lon, job.machine_type, job.radius,
+        on_progress=lambda stage, percent: _report(job, stage, percent)
+    )
+    if not places:
+        raise _JobError('No suitable locations found in this area.')
+    return places, finder.used_fallback
+
+
+def _report(job: SearchJob, stage: str, progress: int) -> None:
+    # Skip the write when nothing visible changed
+    if stage == job.stage and progress == job.progress:
+        return
+    job.stage, job.progress = stage, progress
+    SearchJob.objects.filter(id=job.id, status=SearchJob.STATUS_RUNNING).update(stage=stage, progress=progress)
+
+
+def _finish(job: SearchJob, status: str, **fields) -> None:
+    fields.update(status=status, progress=100, stage='', finished_at=timezone.now())
+    # A job failed as stale keeps that outcome, whatever its worker reports later
+    if SearchJob.objects.filter(id=job.id, status=SearchJob.STATUS_RUNNING).update(**fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
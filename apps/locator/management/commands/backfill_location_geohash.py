@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.locator.geo import geohash_encode
+from apps.locator.models import LOCATION_GEOHASH_PRECISION, Place
+
+
+class Command(BaseCommand):
+    help = "Fill in the geohash column of catalog places saved without one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+
+        # Walk the primary key so each batch is an index range scan, however far in we are
+        while True:
+            batch = list(
+                Place.objects.filter(id__gt=last_id, geohash='')
+                .order_by('id')
+                .only('id', 'latitude', 'longitude')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for place in batch:
+                place.geohash = geohash_encode(place.latitude, place.longitude, LOCATION_GEOHASH_PRECISION)
+            Place.objects.bulk_update(batch, ['geohash'])
+
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Backfilled {updated} rows...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled geohashes for {updated} places"))
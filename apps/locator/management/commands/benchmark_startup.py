@@ -0,0 +1,107 @@
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_MODULES = [
+    'google.generativeai',
+    'paypalrestsdk',
+    'numpy',
+    'apps.locator.services',
+    'apps.locator.views',
+    'apps.toolkit.views',
+    'apps.subscriptions.views',
+]
+
+# Each probe runs in a fresh interpreter, after django.setup() like a worker, and prints seconds taken
+IMPORT_PROBE = """
+import importlib, sys, time
+import django
+django.setup()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+# What a worker does before it can answer its first request: load the WSGI app and the URLconf
+BOOT_PROBE = """
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold import time of the heavy modules, worker boot time and the cost "
+        "of constructing the per-request services, each import in a fresh interpreter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+        parser.add_argument(
+            '--module',
+            action='append',
+            dest='modules',
+            help='Module to time the cold import of (repeatable, defaults to the SDKs and app entry points)'
+        )
+        parser.add_argument(
+            '--constructions',
+            type=int,
+            default=1000,
+            help='How many times to construct each service when timing it'
+        )
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+
+        self.stdout.write(f"Cold imports after django.setup() (median / min of {runs} runs):")
+        for module in options['modules'] or DEFAULT_MODULES:
+            timings = self._probe(IMPORT_PROBE, runs, module)
+            if timings is None:
+                self.stdout.write(self.style.WARNING(f"  {module:<28} could not be imported"))
+            else:
+                self.stdout.write(f"  {module:<28} {self._summary(timings)}")
+
+        timings = self._probe(BOOT_PROBE, runs)
+        if timings is None:
+            raise CommandError('The worker boot probe failed')
+        self.stdout.write(f"Worker boot (WSGI app and URLconf): {self._summary(timings)}")
+
+        # Imported here so the timings above aren't skewed by this process having them loaded
+        from apps.locator.services import LocationFinderService
+        from apps.toolkit.services import ScriptGeneratorService
+
+        number = max(1, options['constructions'])
+        self.stdout.write(f"Service construction (mean of {number}, after the first):")
+        for service in (LocationFinderService, ScriptGeneratorService):
+            service()
+            seconds = timeit.timeit(service, number=number) / number
+            self.stdout.write(f"  {service.__name__:<28} {seconds * 1e6:.1f} us")
+
+    def _probe(self, code, runs, *args):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        timings = []
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, '-c', code, *args],
+                cwd=str(settings.BASE_DIR),
+                env=env,
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                return None
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+        return timings
+
+    def _summary(self, timings):
+        return f"{statistics.median(timings) * 1000:.0f} ms / {min(timings) * 1000:.0f} ms"
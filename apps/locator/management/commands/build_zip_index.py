@@ -0,0 +1,74 @@
+import bz2
+import csv
+import gzip
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.locator.zip_index import DEFAULT_INDEX_PATH, write_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the offline ZIP centroid index from a Census ZCTA gazetteer file "
+        "(tab-separated, GEOID/INTPTLAT/INTPTLONG columns) or a zipcodes-style JSON "
+        "list (zip_code/lat/long), optionally .gz or .bz2 compressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Path to the gazetteer .txt or ZIP .json file')
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'ZIP_INDEX_PATH', DEFAULT_INDEX_PATH),
+            help='Where to write the binary index'
+        )
+        parser.add_argument(
+            '--include-inactive',
+            action='store_true',
+            help='Keep ZIPs marked inactive in JSON sources'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        try:
+            with self._open(source) as f:
+                if '.json' in source:
+                    records = list(self._read_json(f, options['include_inactive']))
+                else:
+                    records = list(self._read_gazetteer(f))
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read {source}: {str(e)}")
+
+        if not records:
+            raise CommandError(f"No ZIP records found in {source}")
+
+        count = write_index(records, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} ZIP centroids to {options['output']}"))
+
+    def _open(self, path):
+        if path.endswith('.bz2'):
+            return bz2.open(path, 'rt', encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, 'r', encoding='utf-8')
+
+    def _read_gazetteer(self, f):
+        reader = csv.reader(f, delimiter='\t')
+        header = [column.strip() for column in next(reader)]
+        zip_col = header.index('GEOID')
+        lat_col = header.index('INTPTLAT')
+        lon_col = header.index('INTPTLONG')
+        for row in reader:
+            yield row[zip_col].strip(), float(row[lat_col]), float(row[lon_col])
+
+    def _read_json(self, f, include_inactive):
+        for item in json.load(f):
+            if not include_inactive and not item.get('active', True):
+                continue
+            # Military APO/FPO codes have no meaningful location
+            if item.get('zip_code_type') == 'MILITARY':
+                continue
+            if not item.get('lat') or not item.get('long'):
+                continue
+            yield item['zip_code'], float(item['lat']), float(item['long'])
@@ -0,0 +1,169 @@
+import bz2
+import gzip
+import xml.etree.ElementTree as ET
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.locator.geo import geohash_encode
+from apps.locator.models import ImportedRegion, OsmPoi, OsmPoiTag
+from apps.locator.poi_store import POI_CELL_PRECISION, POI_KEYS, filter_tags
+from apps.locator.poi_tiles import kept_tag_keys
+from apps.locator.profiles import get_profile_registry
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the named POIs of an OSM XML extract (.osm, optionally .gz or .bz2 "
+        "compressed) into the local POI store. Re-importing a region replaces it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Path to the .osm extract')
+        parser.add_argument('--region', required=True, help='Name for the imported region, e.g. "california"')
+        parser.add_argument(
+            '--bbox',
+            help='Area the extract covers as south,west,north,east (defaults to the file\'s <bounds>)'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        # Keep whatever keys the machine type profiles and category labels currently use as well
+        registry = get_profile_registry()
+        self.poi_keys = POI_KEYS + tuple(key for key in registry.tag_keys if key not in POI_KEYS)
+        self.kept_tags = kept_tag_keys(registry)
+        bounds = self._parse_bbox(options['bbox']) if options['bbox'] else None
+
+        try:
+            # Pass 1: matching nodes, matching ways and the nodes those ways need
+            nodes, ways, needed, file_bounds = self._read_features(source)
+            # Pass 2: coordinates of the way nodes, so ways get a center like Overpass' "out center"
+            coords = self._read_node_coords(source, needed) if needed else {}
+        except (OSError, ET.ParseError) as e:
+            raise CommandError(f"Could not read {source}: {str(e)}")
+
+        pois = list(nodes)
+        for way_id, tags, refs in ways:
+            points = [coords[ref] for ref in refs if ref in coords]
+            if not points:
+                continue
+            lats = [point[0] for point in points]
+            lons = [point[1] for point in points]
+            pois.append(('w', way_id, (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2, tags))
+
+        if not pois:
+            raise CommandError(f"No named POIs found in {source}")
+
+        bounds = bounds or file_bounds or (
+            min(poi[2] for poi in pois), min(poi[3] for poi in pois),
+            max(poi[2] for poi in pois), max(poi[3] for poi in pois),
+        )
+
+        with transaction.atomic():
+            ImportedRegion.objects.filter(name=options['region']).delete()
+            region = ImportedRegion.objects.create(
+                name=options['region'],
+                south=bounds[0], west=bounds[1], north=bounds[2], east=bounds[3],
+                poi_count=len(pois),
+                source=source[-255:]
+            )
+            OsmPoi.objects.bulk_create(
+                (
+                    OsmPoi(
+                        region=region,
+                        osm_type=osm_type,
+                        osm_id=osm_id,
+                        latitude=lat,
+                        longitude=lon,
+                        cell=geohash_encode(lat, lon, POI_CELL_PRECISION),
+                        tags=tags
+                    )
+                    for osm_type, osm_id, lat, lon, tags in pois
+                ),
+                batch_size=BATCH_SIZE
+            )
+            # Ids read back, bulk_create doesn't return them on every database
+            poi_ids = {
+                (osm_type, osm_id): poi_id
+                for poi_id, osm_type, osm_id in region.pois.values_list('id', 'osm_type', 'osm_id')
+            }
+            OsmPoiTag.objects.bulk_create(
+                (
+                    OsmPoiTag(
+                        poi_id=poi_ids[(osm_type, osm_id)],
+                        key=key,
+                        value=value,
+                        cell=geohash_encode(lat, lon, POI_CELL_PRECISION)
+                    )
+                    for osm_type, osm_id, lat, lon, tags in pois
+                    for key, value in filter_tags(tags)
+                ),
+                batch_size=BATCH_SIZE
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(pois)} POIs into region '{region.name}' "
+            f"({bounds[0]:.4f},{bounds[1]:.4f},{bounds[2]:.4f},{bounds[3]:.4f})"
+        ))
+
+    def _parse_bbox(self, value):
+        try:
+            south, west, north, east = (float(part) for part in value.split(','))
+        except ValueError:
+            raise CommandError('--bbox must be south,west,north,east')
+        return south, west, north, east
+
+    def _open(self, path):
+        if path.endswith('.bz2'):
+            return bz2.open(path, 'rb')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    def _elements(self, path):
+        """Stream the top-level elements of an OSM file, freeing each once the caller is done with it"""
+        with self._open(path) as f:
+            context = ET.iterparse(f, events=('start', 'end'))
+            _, root = next(context)
+            for event, element in context:
+                if event == 'end' and element.tag in ('bounds', 'node', 'way', 'relation'):
+                    yield element
+                    root.clear()
+
+    def _kept_tags(self, element):
+        """The element's tags trimmed to the kept keys, or None if it isn't a named POI"""
+        tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+        if 'name' not in tags or not any(key in tags for key in self.poi_keys):
+            return None
+        return {key: tags[key] for key in self.kept_tags if key in tags}
+
+    def _read_features(self, path):
+        nodes, ways, needed, bounds = [], [], set(), None
+        for element in self._elements(path):
+            if element.tag == 'bounds':
+                bounds = tuple(float(element.get(name)) for name in ('minlat', 'minlon', 'maxlat', 'maxlon'))
+            elif element.tag == 'node':
+                tags = self._kept_tags(element)
+                if tags is not None:
+                    nodes.append(('n', int(element.get('id')), float(element.get('lat')), float(element.get('lon')), tags))
+            elif element.tag == 'way':
+                tags = self._kept_tags(element)
+                if tags is not None:
+                    refs = [int(nd.get('ref')) for nd in element.iter('nd')]
+                    ways.append((int(element.get('id')), tags, refs))
+                    needed.update(refs)
+        return nodes, ways, needed, bounds
+
+    def _read_node_coords(self, path, needed):
+        coords = {}
+        for element in self._elements(path):
+            if element.tag == 'node':
+                node_id = int(element.get('id'))
+                if node_id in needed:
+                    coords[node_id] = (float(element.get('lat')), float(element.get('lon')))
+            elif element.tag in ('way', 'relation'):
+                # Extracts list every node before the first way
+                break
+        return coords
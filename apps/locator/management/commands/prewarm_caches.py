@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.locator.geocode_cache import reverse_geocode_cache
+from apps.locator.models import SearchHistory
+from apps.locator.poi_store import fetch_pois
+from apps.locator.poi_tiles import overpass_tile_cache
+from apps.locator.services import LocationFinderService
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-fetch ZIP geocodes, POI tiles and addresses for the most searched "
+        "(zip code, machine type) pairs, so peak-hour searches are served from cache. "
+        "Meant to run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='How far back to look for popular searches')
+        parser.add_argument('--limit', type=int, default=200, help='How many of the top pairs to warm')
+        parser.add_argument(
+            '--radius',
+            type=int,
+            default=5,
+            help='Search radius in miles to warm for searches recorded without one'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between pairs, to keep the load on Overpass low'
+        )
+        parser.add_argument('--skip-addresses', action='store_true', help='Only warm geocodes and POI tiles')
+        parser.add_argument('--dry-run', action='store_true', help='List the pairs without fetching anything')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        history = SearchHistory.objects.filter(created_at__gte=since)
+        total_searches = history.count()
+        pairs = list(
+            history.values('zip_code', 'machine_type', 'radius')
+            .annotate(searches=Count('id'))
+            .order_by('-searches', 'zip_code', 'machine_type', 'radius')[:options['limit']]
+        )
+
+        covered_searches = sum(pair['searches'] for pair in pairs)
+        share = covered_searches / total_searches if total_searches else 0.0
+        self.stdout.write(
+            f"{len(pairs)} pairs cover {covered_searches} of {total_searches} searches "
+            f"in the last {options['days']} days ({share:.0%})"
+        )
+
+        if options['dry_run']:
+            for pair in pairs:
+                self.stdout.write(
+                    f"  {pair['zip_code']}  {pair['machine_type']}  {pair['radius'] or options['radius']} mi  "
+                    f"({pair['searches']} searches)"
+                )
+            return
+
+        finder = LocationFinderService()
+        tiles_before = overpass_tile_cache.stats()
+        addresses_before = reverse_geocode_cache.stats()
+        warmed = unresolved = failed = 0
+
+        for number, pair in enumerate(pairs):
+            if number and options['pause'] > 0:
+                time.sleep(options['pause'])
+
+            try:
+                coords = finder.resolve_zip_code(pair['zip_code'])
+                if not coords:
+                    unresolved += 1
+                    continue
+
+                lat, lon = coords
+                machine_type = pair['machine_type']
+                radius = (pair['radius'] or options['radius']) * 1609
+                place_types = finder._get_place_types(machine_type)
+                buckets = fetch_pois(place_types, lat, lon, radius)
+
+                if not options['skip_addresses']:
+                    # Only the places a search would show get reverse geocoded
+                    places = finder._select_places(buckets, place_types, machine_type, lat, lon, radius)
+                    finder._resolve_addresses(places)
+
+                warmed += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(
+                    f"Could not warm {pair['zip_code']} / {pair['machine_type']}: {str(e)}"
+                ))
+
+        tiles = self._delta(tiles_before, overpass_tile_cache.stats(), ('tile_hits', 'tile_misses'))
+        addresses = self._delta(addresses_before, reverse_geocode_cache.stats(), ('local_hits', 'shared_hits', 'misses'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {warmed} of {len(pairs)} pairs ({unresolved} unknown ZIPs, {failed} failed)"
+        ))
+        self.stdout.write(
+            f"POI tiles: {tiles['tile_hits']} already cached, {tiles['tile_misses']} fetched "
+            f"({self._rate(tiles['tile_hits'], tiles['tile_misses'])} hit rate)"
+        )
+        if not options['skip_addresses']:
+            address_hits = addresses['local_hits'] + addresses['shared_hits']
+            self.stdout.write(
+                f"Addresses: {address_hits} already cached, {addresses['misses']} fetched "
+                f"({self._rate(address_hits, addresses['misses'])} hit rate)"
+            )
+
+    def _delta(self, before, after, keys):
+        return {key: after[key] - before[key] for key in keys}
+
+    def _rate(self, hits, misses):
+        lookups = hits + misses
+        return f"{hits / lookups:.0%}" if lookups else "n/a"
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from apps.locator.jobs import claim_next_job, fail_stale_jobs, run_search_job
+
+
+def _worker_loop(name: str, poll_interval: float, stop_event) -> None:
+    # Each process opens its own database connections
+    connections.close_all()
+    # The parent coordinates shutdown through stop_event so jobs aren't cut off mid-search
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    while not stop_event.is_set():
+        job = claim_next_job(name)
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        run_search_job(job)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "Run worker processes that execute queued background location searches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'SEARCH_JOB_WORKERS', 2),
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds an idle worker waits before checking the queue again'
+        )
+
+    def handle(self, *args, **options):
+        host = socket.gethostname()
+        stop_event = multiprocessing.Event()
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+
+        # Don't hand inherited database connections to the forked workers
+        connections.close_all()
+
+        processes = []
+        for number in range(options['workers']):
+            name = f"{host}:{os.getpid()}:{number}"
+            process = multiprocessing.Process(
+                target=_worker_loop,
+                args=(name, options['poll_interval'], stop_event),
+                name=name,
+                daemon=True
+            )
+            process.start()
+            processes.append(process)
+
+        self.stdout.write(self.style.SUCCESS(f"Started {len(processes)} search workers"))
+
+        try:
+            while True:
+                # Drops a connection the database closed or a worker broke, like a request would
+                close_old_connections()
+                try:
+                    failed = fail_stale_jobs()
+                    if failed:
+                        self.stdout.write(f"Marked {failed} stale search jobs as failed")
+                except DatabaseError as e:
+                    self.stdout.write(self.style.WARNING(f"Stale job check failed: {str(e)}"))
+                    connections.close_all()
+
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        self.stdout.write(self.style.WARNING(f"Worker {process.name} exited, restarting"))
+                        # fail_stale_jobs() reopened a connection, the new worker must not inherit it
+                        connections.close_all()
+                        processes[i] = multiprocessing.Process(
+                            target=_worker_loop,
+                            args=(process.name, options['poll_interval'], stop_event),
+                            name=process.name,
+                            daemon=True
+                        )
+                        processes[i].start()
+
+                time.sleep(30)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping search workers...")
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=60)
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0002_searchjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportedRegion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("south", models.FloatField()),
+                ("west", models.FloatField()),
+                ("north", models.FloatField()),
+                ("east", models.FloatField()),
+                ("poi_count", models.IntegerField(default=0)),
+                ("source", models.CharField(blank=True, max_length=255)),
+                ("imported_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OsmPoi",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("osm_type", models.CharField(max_length=1)),
+                ("osm_id", models.BigIntegerField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("cell", models.CharField(db_index=True, max_length=12)),
+                ("tags", models.JSONField(default=dict)),
+                (
+                    "region",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pois",
+                        to="locator.importedregion",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0003_osm_poi_store"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryLabel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=50)),
+                ("value", models.CharField(blank=True, max_length=100)),
+                ("label", models.CharField(max_length=100)),
+                ("priority", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["priority", "id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MachineTypeProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("is_active", models.BooleanField(default=True)),
+                ("is_default", models.BooleanField(default=False)),
+                ("display_order", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["display_order", "name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProfileTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=50)),
+                ("value", models.CharField(max_length=100)),
+                ("weight", models.FloatField(default=0.5)),
+                ("position", models.IntegerField(default=0)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tags",
+                        to="locator.machinetypeprofile",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["position", "id"],
+            },
+        ),
+    ]
@@ -0,0 +1,141 @@
+from django.db import migrations
+
+# The mappings LocationFinderService._get_place_types used to hard-code
+PROFILES = [
+    (
+        "Claw Machine",
+        [
+            ("amenity", "cinema"),
+            ("amenity", "restaurant"),
+            ("amenity", "fast_food"),
+            ("amenity", "cafe"),
+            ("leisure", "bowling_alley"),
+            ("leisure", "amusement_arcade"),
+            ("shop", "mall"),
+        ],
+    ),
+    (
+        "Snack & Drink Machines",
+        [
+            ("amenity", "school"),
+            ("amenity", "university"),
+            ("amenity", "hospital"),
+            ("amenity", "office"),
+            ("leisure", "fitness_centre"),
+            ("building", "office"),
+        ],
+    ),
+    (
+        "Cotton Candy Machines",
+        [
+            ("amenity", "cinema"),
+            ("amenity", "theatre"),
+            ("leisure", "amusement_arcade"),
+            ("leisure", "park"),
+            ("shop", "mall"),
+        ],
+    ),
+    (
+        "Hot Dog Vending",
+        [
+            ("amenity", "university"),
+            ("amenity", "school"),
+            ("amenity", "hospital"),
+            ("leisure", "stadium"),
+            ("leisure", "sports_centre"),
+            ("building", "office"),
+        ],
+    ),
+    (
+        "Fresh Food Market Machines",
+        [
+            ("amenity", "hospital"),
+            ("amenity", "university"),
+            ("amenity", "office"),
+            ("building", "office"),
+            ("leisure", "fitness_centre"),
+        ],
+    ),
+]
+
+DEFAULT_PROFILE = (
+    "Default",
+    [
+        ("amenity", "school"),
+        ("amenity", "restaurant"),
+        ("amenity", "cafe"),
+        ("leisure", "fitness_centre"),
+        ("shop", "mall"),
+    ],
+)
+
+# The order LocationFinderService._determine_detailed_category checked tags in
+CATEGORY_LABELS = [
+    ("amenity", "cafe", "Cafe"),
+    ("amenity", "restaurant", "Restaurant"),
+    ("amenity", "fast_food", "Fast Food"),
+    ("leisure", "fitness_centre", "Gym/Fitness Center"),
+    ("amenity", "school", "Educational Institution"),
+    ("amenity", "university", "Educational Institution"),
+    ("office", "", "Office Building"),
+    ("amenity", "hospital", "Healthcare Facility"),
+    ("shop", "mall", "Shopping Mall"),
+    ("amenity", "cinema", "Cinema"),
+    ("leisure", "bowling_alley", "Entertainment Venue"),
+]
+
+# Ranking weights on the foot traffic category scale (0, 1 or 2 points, halved)
+HIGH_TRAFFIC = {"mall", "restaurant", "fast_food", "cinema"}
+MEDIUM_TRAFFIC = {"hospital", "school", "office"}
+
+
+def weight_for(value):
+    if value in HIGH_TRAFFIC:
+        return 1.0
+    if value in MEDIUM_TRAFFIC:
+        return 0.5
+    return 0.0
+
+
+def seed_profiles(apps, schema_editor):
+    MachineTypeProfile = apps.get_model("locator", "MachineTypeProfile")
+    ProfileTag = apps.get_model("locator", "ProfileTag")
+    CategoryLabel = apps.get_model("locator", "CategoryLabel")
+
+    profiles = [(name, tags, False) for name, tags in PROFILES]
+    profiles.append(DEFAULT_PROFILE + (True,))
+    for order, (name, tags, is_default) in enumerate(profiles):
+        profile = MachineTypeProfile.objects.create(
+            name=name, is_default=is_default, display_order=order
+        )
+        ProfileTag.objects.bulk_create(
+            ProfileTag(
+                profile=profile,
+                key=key,
+                value=value,
+                weight=weight_for(value),
+                position=position,
+            )
+            for position, (key, value) in enumerate(tags)
+        )
+
+    CategoryLabel.objects.bulk_create(
+        CategoryLabel(key=key, value=value, label=label, priority=priority * 10)
+        for priority, (key, value, label) in enumerate(CATEGORY_LABELS)
+    )
+
+
+def remove_profiles(apps, schema_editor):
+    apps.get_model("locator", "MachineTypeProfile").objects.all().delete()
+    apps.get_model("locator", "CategoryLabel").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0004_machine_type_profiles"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_profiles, remove_profiles),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0005_seed_machine_type_profiles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchhistory",
+            name="radius",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="searchhistory",
+            name="reused_results",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="searchhistory",
+            index=models.Index(
+                fields=["zip_code", "machine_type", "radius", "created_at"],
+                name="locator_sea_zip_cod_8b2ff1_idx",
+            ),
+        ),
+    ]
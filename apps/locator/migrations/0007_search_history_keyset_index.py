@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0006_search_history_radius"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="searchhistory",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="locator_sea_user_id_020632_idx",
+            ),
+        ),
+    ]
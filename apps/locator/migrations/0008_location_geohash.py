@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0007_search_history_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="locationdata",
+            name="geohash",
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0008_location_geohash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Place",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("osm_type", models.CharField(blank=True, max_length=1)),
+                ("osm_id", models.BigIntegerField(blank=True, null=True)),
+                ("name", models.CharField(max_length=255)),
+                ("category", models.CharField(max_length=100)),
+                ("address", models.TextField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("geohash", models.CharField(blank=True, db_index=True, max_length=12)),
+                ("phone", models.CharField(blank=True, max_length=50)),
+                ("email", models.EmailField(blank=True, max_length=254)),
+                ("business_hours", models.CharField(blank=True, max_length=200)),
+                ("tags", models.JSONField(blank=True, default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Nullable until 0011 drops them, so unapplying 0011 can restore the columns
+        # and 0010 copy the data back before the constraints return
+        migrations.AlterField(
+            model_name="locationdata",
+            name="name",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name="locationdata",
+            name="category",
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name="locationdata",
+            name="address",
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="locationdata",
+            name="latitude",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="locationdata",
+            name="longitude",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="locationdata",
+            name="place",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="locator.place",
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.db import migrations
+
+from apps.locator.geo import geohash_encode
+
+BATCH_SIZE = 1000
+
+
+def legacy_key(location):
+    # Rows saved before the catalog carry no OSM id, key them by cell and name
+    geohash = location.geohash or geohash_encode(
+        location.latitude, location.longitude, 8
+    )
+    name_hash = hashlib.sha1(location.name.strip().lower().encode()).hexdigest()[:16]
+    return f"x:{geohash}:{name_hash}"
+
+
+def move_to_places(apps, schema_editor):
+    LocationData = apps.get_model("locator", "LocationData")
+    Place = apps.get_model("locator", "Place")
+
+    last_id = 0
+    while True:
+        batch = list(
+            LocationData.objects.filter(id__gt=last_id, place__isnull=True).order_by(
+                "id"
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        keys = {location.id: legacy_key(location) for location in batch}
+        places = Place.objects.in_bulk(set(keys.values()), field_name="key")
+        for location in batch:
+            key = keys[location.id]
+            if key not in places:
+                places[key] = Place.objects.create(
+                    key=key,
+                    name=location.name,
+                    category=location.category,
+                    address=location.address,
+                    latitude=location.latitude,
+                    longitude=location.longitude,
+                    geohash=location.geohash
+                    or geohash_encode(location.latitude, location.longitude, 8),
+                    phone=location.phone,
+                    email=location.email,
+                    business_hours=location.business_hours,
+                )
+            location.place = places[key]
+
+        LocationData.objects.bulk_update(batch, ["place"])
+        last_id = batch[-1].id
+
+
+def copy_back(apps, schema_editor):
+    LocationData = apps.get_model("locator", "LocationData")
+    for location in LocationData.objects.select_related("place").exclude(
+        place__isnull=True
+    ):
+        place = location.place
+        location.name = place.name
+        location.category = place.category
+        location.address = place.address
+        location.latitude = place.latitude
+        location.longitude = place.longitude
+        location.geohash = place.geohash
+        location.phone = place.phone[:20]
+        location.email = place.email
+        location.business_hours = place.business_hours
+        location.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0009_place_catalog"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_places, copy_back),
+    ]
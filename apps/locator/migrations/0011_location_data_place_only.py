@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0010_move_locations_to_places"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="address",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="business_hours",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="category",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="email",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="geohash",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="latitude",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="longitude",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="name",
+        ),
+        migrations.RemoveField(
+            model_name="locationdata",
+            name="phone",
+        ),
+        migrations.AlterField(
+            model_name="locationdata",
+            name="place",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, to="locator.place"
+            ),
+        ),
+    ]
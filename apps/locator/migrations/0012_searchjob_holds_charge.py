@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0011_location_data_place_only"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchjob",
+            name="holds_charge",
+            field=models.BooleanField(default=False),
+        ),
+    ]
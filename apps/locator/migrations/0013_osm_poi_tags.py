@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0012_searchjob_holds_charge"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OsmPoiTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=50)),
+                ("value", models.CharField(max_length=100)),
+                ("cell", models.CharField(max_length=12)),
+                (
+                    "poi",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="filter_tags",
+                        to="locator.osmpoi",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["key", "value", "cell"],
+                        name="locator_osm_key_b1e49e_idx",
+                    )
+                ],
+            },
+        ),
+    ]
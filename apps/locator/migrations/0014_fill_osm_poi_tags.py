@@ -0,0 +1,45 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# poi_store.DESCRIPTIVE_TAGS when this migration was written
+DESCRIPTIVE_TAGS = (
+    "name",
+    "phone",
+    "contact:phone",
+    "telephone",
+    "email",
+    "contact:email",
+    "opening_hours",
+)
+
+
+def fill_poi_tags(apps, schema_editor):
+    OsmPoi = apps.get_model("locator", "OsmPoi")
+    OsmPoiTag = apps.get_model("locator", "OsmPoiTag")
+
+    batch = []
+    for poi_id, cell, tags in OsmPoi.objects.values_list("id", "cell", "tags").iterator():
+        for key, value in tags.items():
+            if key in DESCRIPTIVE_TAGS or len(key) > 50 or len(value) > 100:
+                continue
+            batch.append(OsmPoiTag(poi_id=poi_id, key=key, value=value, cell=cell))
+        if len(batch) >= BATCH_SIZE:
+            OsmPoiTag.objects.bulk_create(batch)
+            batch = []
+    OsmPoiTag.objects.bulk_create(batch)
+
+
+def clear_poi_tags(apps, schema_editor):
+    apps.get_model("locator", "OsmPoiTag").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0013_osm_poi_tags"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_poi_tags, clear_poi_tags),
+    ]
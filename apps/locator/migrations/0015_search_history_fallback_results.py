@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0014_fill_osm_poi_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchhistory",
+            name="fallback_results",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def mark_fallback_searches(apps, schema_editor):
+    # Only the placeholder result can be told apart after the fact: its address is "Near <lat>, <lon>"
+    SearchHistory = apps.get_model("locator", "SearchHistory")
+    SearchHistory.objects.filter(
+        reused_results=False, locationdata__place__address__startswith="Near "
+    ).update(fallback_results=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("locator", "0015_search_history_fallback_results"),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_fallback_searches, migrations.RunPython.noop),
+    ]
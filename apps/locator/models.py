@@ -1,30 +1,201 @@
 from django.db import models
 from django.conf import settings
+from .geo import bbox_around, geohash_cells_for_bbox, geohash_encode
 
 class SearchHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     zip_code = models.CharField(max_length=10)
     machine_type = models.CharField(max_length=50)
+    radius = models.IntegerField(null=True, blank=True)  # Miles, not recorded before result reuse
     results_count = models.IntegerField()
+    # True when the results were copied from an earlier identical search
+    reused_results = models.BooleanField(default=False)
+    # True when Overpass gave nothing and the results came from the Nominatim fallback, never reused
+    fallback_results = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Finding a recent identical search to reuse
+            models.Index(fields=['zip_code', 'machine_type', 'radius', 'created_at']),
+            # Keyset pagination of a user's history, newest first
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.zip_code} - {self.machine_type}"
 
-class LocationData(models.Model):
-    search_history = models.ForeignKey(SearchHistory, on_delete=models.CASCADE)
+# Geohash precision 8 cells are roughly 38m x 19m; any prefix is a coarser cell
+LOCATION_GEOHASH_PRECISION = 8
+
+class PlaceQuerySet(models.QuerySet):
+    def near(self, lat, lon, radius_m):
+        """Places whose geohash cell intersects the box around a circle; refine with an exact distance check"""
+        # Finest precision whose cells are still at least radius_m tall, so the box spans a few prefixes
+        precision = 1
+        while precision < LOCATION_GEOHASH_PRECISION and 180 / 2 ** (5 * (precision + 1) // 2) * 111320 >= radius_m:
+            precision += 1
+        cells = geohash_cells_for_bbox(bbox_around(lat, lon, radius_m), precision)
+        query = models.Q()
+        for cell in cells:
+            query |= models.Q(geohash__startswith=cell)
+        return self.filter(query)
+
+# Catalog of every place any search has returned, stored once and updated in place
+class Place(models.Model):
+    # 'n123' / 'w456' for OSM elements, 'x:<geohash>:<name hash>' for places without an OSM id
+    key = models.CharField(max_length=64, unique=True)
+    osm_type = models.CharField(max_length=1, blank=True)  # 'n', 'w' or 'r'
+    osm_id = models.BigIntegerField(null=True, blank=True)
     name = models.CharField(max_length=255)
     category = models.CharField(max_length=100)
     address = models.TextField()
     latitude = models.FloatField()
     longitude = models.FloatField()
-    phone = models.CharField(max_length=20, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+    phone = models.CharField(max_length=50, blank=True)
     email = models.EmailField(blank=True)
     business_hours = models.CharField(max_length=200, blank=True)
+    tags = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = PlaceQuerySet.as_manager()
+    
+    def save(self, *args, **kwargs):
+        if not self.geohash and self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude, LOCATION_GEOHASH_PRECISION)
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.name} - {self.category}"
+
+# One place as returned by one search; everything that doesn't change per search lives on Place
+class LocationData(models.Model):
+    search_history = models.ForeignKey(SearchHistory, on_delete=models.CASCADE)
+    place = models.ForeignKey(Place, on_delete=models.PROTECT)
     foot_traffic = models.CharField(max_length=20, default='Low')  # Low, Moderate, High
     
     def __str__(self):
-        return f"{self.name} - {self.category}"
\ No newline at end of file
+        return f"{self.place} ({self.foot_traffic})"
+
+class SearchJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    zip_code = models.CharField(max_length=10)
+    machine_type = models.CharField(max_length=50)
+    radius = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.IntegerField(default=0)  # 0-100
+    stage = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    search_history = models.ForeignKey(SearchHistory, null=True, blank=True, on_delete=models.SET_NULL)
+    # True while the job holds a search charge that was neither kept nor refunded yet
+    holds_charge = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.zip_code} - {self.status}"
+
+# OSM extracts loaded into the local POI store by manage.py import_osm_extract
+class ImportedRegion(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    south = models.FloatField()
+    west = models.FloatField()
+    north = models.FloatField()
+    east = models.FloatField()
+    poi_count = models.IntegerField(default=0)
+    source = models.CharField(max_length=255, blank=True)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.poi_count} POIs)"
+
+class OsmPoi(models.Model):
+    region = models.ForeignKey(ImportedRegion, on_delete=models.CASCADE, related_name='pois')
+    osm_type = models.CharField(max_length=1)  # 'n' for nodes, 'w' for ways
+    osm_id = models.BigIntegerField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    # Geohash of POI_CELL_PRECISION characters, the spatial index for radius queries
+    cell = models.CharField(max_length=12, db_index=True)
+    tags = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.osm_type}{self.osm_id} - {self.tags.get('name', '')}"
+
+# One (key, value) tag a search can filter an OsmPoi on, so the filtering happens in SQL
+class OsmPoiTag(models.Model):
+    poi = models.ForeignKey(OsmPoi, on_delete=models.CASCADE, related_name='filter_tags')
+    key = models.CharField(max_length=50)
+    value = models.CharField(max_length=100)
+    # The POI's cell, so one index covers the tag and the area of a radius query
+    cell = models.CharField(max_length=12)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'value', 'cell']),
+        ]
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+# Machine type profiles: which OSM tags each machine type searches, editable in the admin
+class MachineTypeProfile(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    is_active = models.BooleanField(default=True)
+    # Used for machine types without a profile of their own, not listed on the dashboard
+    is_default = models.BooleanField(default=False)
+    display_order = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['display_order', 'name']
+    
+    def __str__(self):
+        return self.name
+
+class ProfileTag(models.Model):
+    profile = models.ForeignKey(MachineTypeProfile, on_delete=models.CASCADE, related_name='tags')
+    key = models.CharField(max_length=50)
+    value = models.CharField(max_length=100)
+    weight = models.FloatField(default=0.5)  # 0-1, how strongly ranking favours this kind of place
+    position = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position', 'id']
+    
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+# Display category for places carrying a tag; the lowest priority matching rule wins
+class CategoryLabel(models.Model):
+    key = models.CharField(max_length=50)
+    value = models.CharField(max_length=100, blank=True)  # Blank matches any value of the key
+    label = models.CharField(max_length=100)
+    priority = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['priority', 'id']
+    
+    def __str__(self):
+        return f"{self.key}={self.value or '*'} -> {self.label}"
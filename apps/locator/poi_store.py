@@ -0,0 +1,118 @@
+"""
+Local POI store built from OSM extracts, with Overpass as the fallback.
+
+``manage.py import_osm_extract`` loads the named nodes and ways of a region
+into OsmPoi rows, each keyed by the geohash cell it falls in. When
+LOCATOR_POI_BACKEND is 'local', searches whose circle lies inside an
+imported region are answered from those rows. Each POI's filterable tags
+are also stored as OsmPoiTag rows indexed by (key, value, cell), so one
+query picks the POIs carrying a searched tag in the covering cells and only
+the distance check runs in Python. Everything else still goes through the
+Overpass tile cache.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+
+from .geo import bbox_around, geohash_cells_for_bbox, haversine_m
+from .models import ImportedRegion, OsmPoiTag
+from .poi_tiles import expand_element, overpass_tile_cache
+
+# Geohash precision 5 cells are roughly 4.9km x 4.9km
+POI_CELL_PRECISION = 5
+
+# Tag keys the seeded machine type profiles filter on; an extract keeps named elements carrying
+# any of them, plus whatever keys the profiles use at import time
+POI_KEYS = ('amenity', 'leisure', 'shop', 'building')
+
+# Kept tags that describe a POI rather than classify it, never searched on
+DESCRIPTIVE_TAGS = (
+    'name', 'phone', 'contact:phone', 'telephone', 'email', 'contact:email', 'opening_hours',
+)
+
+
+def filter_tags(tags: Dict) -> List[Tuple[str, str]]:
+    """The (key, value) pairs of a POI's tags that get an OsmPoiTag row"""
+    return [
+        (key, value) for key, value in tags.items()
+        if key not in DESCRIPTIVE_TAGS and len(key) <= 50 and len(value) <= 100
+    ]
+
+
+class LocalPoiStore:
+    def covers(self, bbox) -> bool:
+        """True when one imported region contains the whole (south, west, north, east) box"""
+        south, west, north, east = bbox
+        return ImportedRegion.objects.filter(
+            south__lte=south, west__lte=west, north__gte=north, east__gte=east
+        ).exists()
+
+    def fetch(self, place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Optional[Dict[Tuple[str, str], List[Dict]]]:
+        """Same result as OverpassTileCache.fetch, or None when the area hasn't been imported"""
+        bbox = bbox_around(lat, lon, radius)
+        if not self.covers(bbox):
+            return None
+
+        filters = [(key, value) for key, values in place_types.items() for value in values]
+        buckets = {f: [] for f in filters}
+        if not filters:
+            return buckets
+
+        matches_filter = Q()
+        for key, values in place_types.items():
+            matches_filter |= Q(key=key, value__in=values)
+        south, west, north, east = bbox
+        rows = OsmPoiTag.objects.filter(
+            matches_filter,
+            cell__in=geohash_cells_for_bbox(bbox, POI_CELL_PRECISION),
+            poi__latitude__range=(south, north),
+            poi__longitude__range=(west, east),
+        ).values_list(
+            'key', 'value', 'poi__osm_type', 'poi__osm_id', 'poi__latitude', 'poi__longitude', 'poi__tags'
+        )
+
+        seen = set()
+        for key, value, *row in rows:
+            # Overlapping regions can hold the same element twice
+            if (key, value, row[0], row[1]) in seen:
+                continue
+            seen.add((key, value, row[0], row[1]))
+            if haversine_m(lat, lon, row[2], row[3]) <= radius:
+                buckets[(key, value)].append(row)
+
+        # Same order Overpass uses: nodes before ways, then by id
+        for f, elements in buckets.items():
+            elements.sort(key=lambda row: (row[0] != 'n', row[1]))
+            buckets[f] = [expand_element(row) for row in elements]
+        return buckets
+
+
+local_poi_store = LocalPoiStore()
+
+
+def fetch_pois(place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Dict[Tuple[str, str], List[Dict]]:
+    """Elements within radius meters of (lat, lon) per (key, value) filter, from the configured backend"""
+    if getattr(settings, 'LOCATOR_POI_BACKEND', 'overpass') == 'local':
+        try:
+            buckets = local_poi_store.fetch(place_types, lat, lon, radius)
+            if buckets is not None:
+                return buckets
+        except Exception as e:
+            print(f"Local POI store error: {str(e)}")
+
+    return overpass_tile_cache.fetch(place_types, lat, lon, radius)
+
+
+async def afetch_pois(place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Dict[Tuple[str, str], List[Dict]]:
+    """Async version of fetch_pois()"""
+    if getattr(settings, 'LOCATOR_POI_BACKEND', 'overpass') == 'local':
+        try:
+            buckets = await sync_to_async(local_poi_store.fetch)(place_types, lat, lon, radius)
+            if buckets is not None:
+                return buckets
+        except Exception as e:
+            print(f"Local POI store error: {str(e)}")
+
+    return await overpass_tile_cache.afetch(place_types, lat, lon, radius)
@@ -0,0 +1,258 @@
+"""
+Tile-based cache of Overpass POI results.
+
+The map is cut into a fixed grid of tiles (OVERPASS_TILE_SIZE degrees).
+Each tile is one cache entry holding, in a compact normalized form that
+only keeps the tags the locator reads, every element matching any tag
+filter the machine type profiles search, so all machine types share it.
+Wide searches move up to coarser tiles (twice the size per step) until
+they touch at most OVERPASS_TILE_MAX_PER_SEARCH of them. A search fetches
+only its missing or expired tiles, grouped into rectangles, with one
+Overpass query, and assembles its result from the cached tiles plus a
+local distance filter.
+"""
+import hashlib
+import re
+import threading
+from typing import Dict, List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from vending_locator.cache_keys import cache_key
+
+from .geo import bbox_around, haversine_m, tile_bbox, tile_for, tiles_for_bbox
+from .profiles import get_profile_registry
+from .upstream import UpstreamUnavailable, async_overpass, overpass
+
+# Tags read by find_nearby_places and the default category labels; kept_tag_keys() adds the
+# keys profiles and category labels use
+KEPT_TAGS = (
+    'name', 'amenity', 'leisure', 'shop', 'office', 'building',
+    'phone', 'contact:phone', 'telephone', 'email', 'contact:email', 'opening_hours',
+)
+
+TYPE_CODES = {'node': 'n', 'way': 'w'}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+
+def normalize_element(element: Dict, kept_tags=KEPT_TAGS):
+    """Reduce an Overpass element to [type, id, lat, lon, tags]"""
+    if 'lat' in element and 'lon' in element:
+        lat, lon = element['lat'], element['lon']
+    elif 'center' in element:
+        lat, lon = element['center']['lat'], element['center']['lon']
+    else:
+        return None
+
+    tags = element.get('tags', {})
+    kept = {key: tags[key] for key in kept_tags if key in tags}
+    return [TYPE_CODES.get(element.get('type'), 'n'), element.get('id'), lat, lon, kept]
+
+
+def overpass_elements(payload: Dict) -> List[Dict]:
+    """Elements of an Overpass response, raising UpstreamUnavailable when it was cut short
+
+    A query that times out or runs out of memory still comes back as HTTP 200,
+    with a remark and whatever elements were found before it stopped.
+    """
+    if payload.get('remark'):
+        raise UpstreamUnavailable(f"Overpass returned an incomplete result: {payload['remark']}")
+    return payload.get('elements', [])
+
+
+def kept_tag_keys(registry=None) -> Tuple[str, ...]:
+    """KEPT_TAGS plus every key the profile registry filters or categorizes on"""
+    registry = registry or get_profile_registry()
+    extra = sorted((set(registry.tag_keys) | set(registry.label_keys)) - set(KEPT_TAGS))
+    return KEPT_TAGS + tuple(extra)
+
+
+def expand_element(row) -> Dict:
+    """Turn a normalized row back into an Overpass-shaped element"""
+    type_code, element_id, lat, lon, tags = row
+    return {'type': TYPE_NAMES[type_code], 'id': element_id, 'lat': lat, 'lon': lon, 'tags': tags}
+
+
+def tile_rectangles(tiles) -> List[Tuple[int, int, int, int]]:
+    """Group tiles into (row_min, col_min, row_max, col_max) rectangles covering exactly those tiles"""
+    runs = {}
+    for row, col in sorted(tiles):
+        row_runs = runs.setdefault(row, [])
+        if row_runs and row_runs[-1][1] == col - 1:
+            row_runs[-1][1] = col
+        else:
+            row_runs.append([col, col])
+
+    # Stack identical column runs of consecutive rows into one rectangle
+    rectangles, open_rects = [], {}
+    for row in sorted(runs):
+        still_open = {}
+        for col_min, col_max in runs[row]:
+            rect = open_rects.get((col_min, col_max))
+            if rect is not None and rect[2] == row - 1:
+                rect[2] = row
+            else:
+                rect = [row, col_min, row, col_max]
+                rectangles.append(rect)
+            still_open[(col_min, col_max)] = rect
+        open_rects = still_open
+    return [(row_min, col_min, row_max, col_max) for row_min, col_min, row_max, col_max in rectangles]
+
+
+class OverpassTileCache:
+    def __init__(self, tile_size: float, ttl: int, max_tiles: int):
+        self.tile_size = tile_size
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self._lock = threading.Lock()
+        self.tile_hits = 0
+        self.tile_misses = 0
+
+    def fetch(self, place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Dict[Tuple[str, str], List[Dict]]:
+        """Return elements within radius meters of (lat, lon), bucketed per (key, value) filter"""
+        plan = self._plan(place_types, lat, lon, radius)
+        rows = self._cached_rows(plan, cache.get_many(list(plan['keys'].values())))
+        missing = [tile for tile in plan['tiles'] if tile not in rows]
+
+        if missing:
+            try:
+                response = overpass.post(data=self._build_query(plan, missing), timeout=30)
+                response.raise_for_status()
+                # Incomplete responses are never cached, the missing tiles stay missing
+                fetched = self._split_into_tiles(plan, overpass_elements(response.json()), missing)
+                cache.set_many({plan['keys'][tile]: tile_rows for tile, tile_rows in fetched.items()}, self.ttl)
+                rows.update(fetched)
+            except Exception as e:
+                print(f"Overpass tile fetch error: {str(e)}")
+
+        return self._assemble(plan, rows, lat, lon, radius)
+
+    async def afetch(self, place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Dict[Tuple[str, str], List[Dict]]:
+        """Async version of fetch() for the ASGI search path"""
+        # The profile registry may need compiling from the database, which can't happen on the event loop
+        plan = await sync_to_async(self._plan)(place_types, lat, lon, radius)
+        rows = self._cached_rows(plan, await cache.aget_many(list(plan['keys'].values())))
+        missing = [tile for tile in plan['tiles'] if tile not in rows]
+
+        if missing:
+            try:
+                response = await async_overpass.post(content=self._build_query(plan, missing), timeout=30)
+                response.raise_for_status()
+                fetched = self._split_into_tiles(plan, overpass_elements(response.json()), missing)
+                await cache.aset_many({plan['keys'][tile]: tile_rows for tile, tile_rows in fetched.items()}, self.ttl)
+                rows.update(fetched)
+            except Exception as e:
+                print(f"Overpass tile fetch error: {str(e)}")
+
+        return self._assemble(plan, rows, lat, lon, radius)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.tile_hits + self.tile_misses
+            return {
+                'tile_hits': self.tile_hits,
+                'tile_misses': self.tile_misses,
+                'hit_rate': self.tile_hits / lookups if lookups else 0.0,
+            }
+
+    def tile_size_for(self, bbox) -> float:
+        """Base tile size, doubled until the box touches at most max_tiles tiles"""
+        tile_size = self.tile_size
+        while len(tiles_for_bbox(bbox, tile_size)) > self.max_tiles:
+            tile_size *= 2
+        return tile_size
+
+    def _plan(self, place_types: Dict[str, List[str]], lat: float, lon: float, radius: int) -> Dict:
+        """Work out the filters, tile grid, tiles and cache keys one search needs"""
+        requested = [(key, value) for key, values in place_types.items() for value in values]
+        registry = get_profile_registry()
+        # Tiles hold every filter the profiles use, plus any asked for outside them
+        tile_filters = sorted(set(registry.filters) | set(requested))
+        kept_tags = kept_tag_keys(registry)
+        kept_tags += tuple(sorted({key for key, _ in requested} - set(kept_tags)))
+        # Editing the filters or the kept keys in the admin moves every tile to new keys
+        signature = hashlib.sha1(
+            '|'.join([f"{key}={value}" for key, value in tile_filters] + list(kept_tags)).encode()
+        ).hexdigest()[:12]
+
+        bbox = bbox_around(lat, lon, radius)
+        tile_size = self.tile_size_for(bbox)
+        tiles = tiles_for_bbox(bbox, tile_size)
+        return {
+            'requested': requested,
+            'tile_filters': tile_filters,
+            'kept_tags': kept_tags,
+            'tile_size': tile_size,
+            'tiles': tiles,
+            'keys': {tile: cache_key('locator', 'poi', signature, tile_size, tile[0], tile[1]) for tile in tiles},
+        }
+
+    def _cached_rows(self, plan: Dict, cached: Dict) -> Dict:
+        rows = {tile: cached[key] for tile, key in plan['keys'].items() if key in cached}
+        with self._lock:
+            self.tile_hits += len(rows)
+            self.tile_misses += len(plan['keys']) - len(rows)
+        return rows
+
+    def _assemble(self, plan: Dict, rows: Dict, lat: float, lon: float, radius: int) -> Dict[Tuple[str, str], List[Dict]]:
+        buckets = {f: [] for f in plan['requested']}
+        for tile in plan['tiles']:
+            for row in rows.get(tile, []):
+                matching = [f for f in plan['requested'] if row[4].get(f[0]) == f[1]]
+                if matching and haversine_m(lat, lon, row[2], row[3]) <= radius:
+                    for f in matching:
+                        buckets[f].append(row)
+
+        for f, elements in buckets.items():
+            # Same order Overpass uses: nodes before ways, then by id
+            elements.sort(key=lambda row: (row[0] != 'n', row[1]))
+            buckets[f] = [expand_element(row) for row in elements]
+        return buckets
+
+    def _split_into_tiles(self, plan: Dict, elements: List[Dict], missing) -> Dict:
+        fetched = {tile: [] for tile in missing}
+        for element in elements:
+            row = normalize_element(element, plan['kept_tags'])
+            if row is None:
+                continue
+            # A way's center can fall in a tile that was already cached, it is kept there
+            tile = tile_for(row[2], row[3], plan['tile_size'])
+            if tile in fetched:
+                fetched[tile].append(row)
+        return fetched
+
+    def _build_query(self, plan: Dict, missing) -> str:
+        """One Overpass query for the tile filters over the rectangles the missing tiles form"""
+        values_by_key = {}
+        for key, value in plan['tile_filters']:
+            values_by_key.setdefault(key, []).append(value)
+
+        statements = []
+        for row_min, col_min, row_max, col_max in tile_rectangles(missing):
+            south, west, _, _ = tile_bbox((row_min, col_min), plan['tile_size'])
+            _, _, north, east = tile_bbox((row_max, col_max), plan['tile_size'])
+            area = f"{south:.6f},{west:.6f},{north:.6f},{east:.6f}"
+            for key, values in values_by_key.items():
+                if len(values) == 1:
+                    selector = f'["{key}"="{values[0]}"]'
+                else:
+                    selector = f'["{key}"~"^({"|".join(re.escape(value) for value in values)})$"]'
+                statements.append(f'node{selector}({area});')
+                statements.append(f'way{selector}({area});')
+
+        body = "\n    ".join(statements)
+        return f"""
+[out:json][timeout:25];
+(
+    {body}
+);
+out center tags;
+"""
+
+
+overpass_tile_cache = OverpassTileCache(
+    tile_size=getattr(settings, 'OVERPASS_TILE_SIZE', 0.05),
+    ttl=getattr(settings, 'OVERPASS_TILE_TTL', 60 * 60 * 24 * 7),
+    max_tiles=getattr(settings, 'OVERPASS_TILE_MAX_PER_SEARCH', 36),
+)
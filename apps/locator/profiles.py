@@ -0,0 +1,137 @@
+"""
+Registry of machine type profiles compiled from the database.
+
+MachineTypeProfile/ProfileTag rows say which OSM tag filters a machine
+type searches and how much each kind of place weighs in ranking.
+CategoryLabel rows turn a place's tags into its display category. All of
+it is compiled once into plain dicts: place_types() is a lookup and
+categorize() costs one dict probe per tag on the element, however many
+profiles or labels exist.
+
+Saving or deleting any of those rows bumps a version number in the state
+cache. Every process notices within REFRESH_INTERVAL seconds and
+recompiles, so admin edits apply without a deploy.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models.signals import post_delete, post_save
+from vending_locator.cache_keys import cache_key, state_cache
+
+from .models import CategoryLabel, MachineTypeProfile, ProfileTag
+
+VERSION_KEY = cache_key('locator', 'profiles', 'version')
+
+# How often a process checks the state cache for admin edits
+REFRESH_INTERVAL = 5
+
+FALLBACK_CATEGORY = 'Business Location'
+
+
+class ProfileRegistry:
+    def __init__(self, profiles: Dict[str, Dict], default: Optional[Dict], labels: List[Tuple[str, str, str]]):
+        self._profiles = profiles
+        self._default = default or {'place_types': {}, 'weights': {}}
+        self.machine_types = [name for name, profile in profiles.items() if profile['listed']]
+
+        # (key, value) -> (priority, label) and key -> (priority, label) for any-value rules
+        self._exact = {}
+        self._any_value = {}
+        # Keys categorize() looks at, which cached and imported elements must keep
+        self.label_keys = sorted({key for key, _, _ in labels})
+        for priority, (key, value, label) in enumerate(labels):
+            table, lookup = (self._exact, (key, value)) if value else (self._any_value, key)
+            table.setdefault(lookup, (priority, label))
+
+        # Every (key, value) filter any profile searches, what a POI tile is fetched for
+        self.filters = sorted({
+            (key, value)
+            for profile in list(profiles.values()) + [self._default]
+            for key, values in profile['place_types'].items()
+            for value in values
+        })
+        self.tag_keys = sorted({key for key, _ in self.filters})
+
+    def _profile(self, machine_type: str) -> Dict:
+        return self._profiles.get(machine_type, self._default)
+
+    def place_types(self, machine_type: str) -> Dict[str, List[str]]:
+        """OSM tag filters for a machine type, the default profile's for unknown types"""
+        return {key: list(values) for key, values in self._profile(machine_type)['place_types'].items()}
+
+    def weight(self, machine_type: str, key: str, value: str) -> float:
+        return self._profile(machine_type)['weights'].get((key, value), 0.0)
+
+    def categorize(self, tags: Dict) -> str:
+        """Display category for an element's tags"""
+        best = None
+        for key, value in tags.items():
+            for match in (self._exact.get((key, value)), self._any_value.get(key)):
+                if match is not None and (best is None or match[0] < best[0]):
+                    best = match
+        return best[1] if best else FALLBACK_CATEGORY
+
+
+def compile_registry() -> ProfileRegistry:
+    profiles, default = {}, None
+    tags = ProfileTag.objects.filter(profile__is_active=True).select_related('profile').order_by(
+        'profile__display_order', 'profile__name', 'position', 'id'
+    )
+    for tag in tags:
+        profile = profiles.setdefault(tag.profile.name, {
+            'place_types': {},
+            'weights': {},
+            'listed': not tag.profile.is_default,
+            'is_default': tag.profile.is_default,
+        })
+        profile['place_types'].setdefault(tag.key, []).append(tag.value)
+        profile['weights'][(tag.key, tag.value)] = tag.weight
+
+    for name, profile in list(profiles.items()):
+        if profile['is_default']:
+            default = profiles.pop(name)
+
+    labels = list(CategoryLabel.objects.values_list('key', 'value', 'label'))
+    return ProfileRegistry(profiles, default, labels)
+
+
+_lock = threading.Lock()
+_registry = None
+_version = None
+_checked_at = 0.0
+
+
+def get_profile_registry() -> ProfileRegistry:
+    """The compiled registry, rebuilt when profiles have changed"""
+    global _registry, _version, _checked_at
+
+    now = time.monotonic()
+    if _registry is not None and now - _checked_at < REFRESH_INTERVAL:
+        return _registry
+
+    with _lock:
+        cache = state_cache()
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = time.time()
+            cache.add(VERSION_KEY, version, None)
+            version = cache.get(VERSION_KEY, version)
+        if _registry is None or version != _version:
+            _registry = compile_registry()
+            _version = version
+        _checked_at = now
+        return _registry
+
+
+def invalidate_profile_registry(**kwargs) -> None:
+    """Make every process recompile the registry on its next lookup"""
+    global _registry
+    state_cache().set(VERSION_KEY, time.time(), None)
+    with _lock:
+        _registry = None
+
+
+for model in (MachineTypeProfile, ProfileTag, CategoryLabel):
+    post_save.connect(invalidate_profile_registry, sender=model, dispatch_uid=f'locator-profiles-save-{model.__name__}')
+    post_delete.connect(invalidate_profile_registry, sender=model, dispatch_uid=f'locator-profiles-delete-{model.__name__}')
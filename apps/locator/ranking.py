@@ -0,0 +1,59 @@
+"""
+Vectorized ranking of candidate places.
+
+Every candidate of a search becomes one slot in a set of NumPy arrays, so
+distances, scores and the per-type cap are computed in a handful of array
+operations no matter how many elements a wide-radius search returns.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_M
+
+# How much each signal contributes to a place's score (each signal is 0-1)
+DISTANCE_WEIGHT = 0.6
+CATEGORY_WEIGHT = 0.3
+TRAFFIC_WEIGHT = 0.1
+
+TRAFFIC_LEVELS = {'Low': 0.0, 'Moderate': 0.5, 'High': 1.0}
+
+
+def haversine_m(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters from one point to arrays of points"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons - lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def score_places(lat: float, lon: float, radius: float, lats: np.ndarray, lons: np.ndarray,
+                 category_weights: np.ndarray, traffic: Optional[List[str]] = None) -> np.ndarray:
+    """Score candidates: closer, busier categories and higher foot traffic rank first"""
+    distances = haversine_m(lat, lon, lats, lons)
+    closeness = 1.0 - np.minimum(distances / max(radius, 1.0), 1.0)
+    scores = DISTANCE_WEIGHT * closeness + CATEGORY_WEIGHT * category_weights
+
+    if traffic is not None:
+        levels = np.array([TRAFFIC_LEVELS.get(level, 0.0) for level in traffic])
+        scores = scores + TRAFFIC_WEIGHT * levels
+    return scores
+
+
+def top_k(scores: np.ndarray, groups: np.ndarray, per_group: int, k: int) -> np.ndarray:
+    """Indices of the best k candidates, best first, with at most per_group from each group"""
+    if not len(scores):
+        return np.array([], dtype=int)
+
+    # Rank within each group by score, then drop everything past the cap
+    order = np.lexsort((-scores, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    group_start = starts[np.searchsorted(starts, np.arange(len(order)), side='right') - 1]
+    capped = order[np.arange(len(order)) - group_start < per_group]
+
+    if len(capped) > k:
+        capped = capped[np.argpartition(-scores[capped], k - 1)[:k]]
+    return capped[np.argsort(-scores[capped], kind='stable')]
@@ -1,146 +1,153 @@
-import requests
 import time
 import random
-from typing import List, Dict, Optional, Tuple
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Generator, List, Dict, Optional, Tuple
+import numpy as np
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import google.generativeai as genai
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from vending_locator.cache_keys import cache_key
+from .catalog import element_key, fill_known_addresses, place_dict, place_key, upsert_places
+from .dedupe import dedupe_elements
+from .geo import SpatialGrid
+from .geocode_cache import reverse_geocode_cache
+from .models import SearchHistory, LocationData
+from .poi_store import fetch_pois
+from .profiles import get_profile_registry
+from .ranking import score_places, top_k
+from .upstream import nominatim, overpass
+from .zip_index import get_zip_index
+
 
 class FootTrafficEstimator:
+    # Neighbourhood radius in meters for each signal
+    TRANSPORT_RADIUS = 500
+    RESIDENTIAL_RADIUS = 800
+    COMMERCIAL_RADIUS = 300
+    
     @staticmethod
     def estimate_foot_traffic(lat: float, lon: float, category: str) -> str:
         """
         Estimate foot traffic based on OSM data and location characteristics
         Returns: 'Low', 'Moderate', or 'High'
         """
+        return FootTrafficEstimator.estimate_batch([(lat, lon, category)])[0]
+    
+    @staticmethod
+    def estimate_batch(points: List[Tuple[float, float, str]]) -> List[str]:
+        """
+        Estimate foot traffic for many (lat, lon, category) points with a single Overpass query
+        Returns one of 'Low', 'Moderate' or 'High' per point, in order
+        """
+        if not points:
+            return []
+        
         try:
+            transport, residential, commercial = FootTrafficEstimator._fetch_features(points)
+        except Exception as e:
+            print(f"Foot traffic estimation error: {str(e)}")
+            return ['Low'] * len(points)  # Default fallback
+        
+        levels = []
+        for lat, lon, category in points:
             score = 0
             
             # Check proximity to public transport
-            transport_score = FootTrafficEstimator._check_transport_proximity(lat, lon)
-            score += transport_score
+            score += min(3, transport.count_within(lat, lon, FootTrafficEstimator.TRANSPORT_RADIUS))  # Max 3 points
             
             # Check residential density
-            residential_score = FootTrafficEstimator._check_residential_density(lat, lon)
-            score += residential_score
+            residential_count = residential.count_within(lat, lon, FootTrafficEstimator.RESIDENTIAL_RADIUS)
+            if residential_count > 20:
+                score += 2
+            elif residential_count > 10:
+                score += 1
             
             # Check commercial activity
-            commercial_score = FootTrafficEstimator._check_commercial_activity(lat, lon)
-            score += commercial_score
+            commercial_count = commercial.count_within(lat, lon, FootTrafficEstimator.COMMERCIAL_RADIUS)
+            if commercial_count > 15:
+                score += 3
+            elif commercial_count > 8:
+                score += 2
+            elif commercial_count > 3:
+                score += 1
             
             # Category-based adjustment
-            category_score = FootTrafficEstimator._get_category_score(category)
-            score += category_score
+            score += FootTrafficEstimator._get_category_score(category)
             
             # Convert score to traffic level
             if score >= 7:
-                return 'High'
+                levels.append('High')
             elif score >= 4:
-                return 'Moderate'
+                levels.append('Moderate')
             else:
-                return 'Low'
-                
-        except Exception as e:
-            print(f"Foot traffic estimation error: {str(e)}")
-            return 'Low'  # Default fallback
-    
-    @staticmethod
-    def _check_transport_proximity(lat: float, lon: float) -> int:
-        """Check proximity to public transport hubs"""
-        try:
-            query = f"""
-            [out:json][timeout:15];
-            (
-              node["public_transport"](around:500,{lat},{lon});
-              node["railway"="station"](around:500,{lat},{lon});
-              node["amenity"="bus_station"](around:500,{lat},{lon});
-            );
-            out count;
-            """
-            
-            response = requests.post(
-                "https://overpass-api.de/api/interpreter",
-                data=query,
-                timeout=20
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                count = len(data.get('elements', []))
-                return min(3, count)  # Max 3 points
-            return 0
-            
-        except Exception:
-            return 0
-    
-    @staticmethod
-    def _check_residential_density(lat: float, lon: float) -> int:
-        """Check density of residential buildings"""
-        try:
-            query = f"""
-            [out:json][timeout:15];
-            (
-              way["building"="residential"](around:800,{lat},{lon});
-              way["building"="apartments"](around:800,{lat},{lon});
-            );
-            out count;
-            """
-            
-            response = requests.post(
-                "https://overpass-api.de/api/interpreter",
-                data=query,
-                timeout=20
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                count = len(data.get('elements', []))
-                if count > 20:
-                    return 2
-                elif count > 10:
-                    return 1
-            return 0
-            
-        except Exception:
-            return 0
+                levels.append('Low')
+        
+        return levels
     
     @staticmethod
-    def _check_commercial_activity(lat: float, lon: float) -> int:
-        """Check commercial activity in the area"""
-        try:
-            query = f"""
-            [out:json][timeout:15];
-            (
-              node["shop"](around:300,{lat},{lon});
-              node["amenity"~"^(restaurant|cafe|fast_food|bar)$"](around:300,{lat},{lon});
-            );
-            out count;
-            """
-            
-            response = requests.post(
-                "https://overpass-api.de/api/interpreter",
-                data=query,
-                timeout=20
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                count = len(data.get('elements', []))
-                if count > 15:
-                    return 3
-                elif count > 8:
-                    return 2
-                elif count > 3:
-                    return 1
-            return 0
-            
-        except Exception:
-            return 0
+    def _fetch_features(points: List[Tuple[float, float, str]]) -> Tuple[SpatialGrid, SpatialGrid, SpatialGrid]:
+        """Fetch transport, residential and commercial features around every point in one query"""
+        statements = []
+        for lat, lon, _ in points:
+            transport_area = f"around:{FootTrafficEstimator.TRANSPORT_RADIUS},{lat},{lon}"
+            residential_area = f"around:{FootTrafficEstimator.RESIDENTIAL_RADIUS},{lat},{lon}"
+            commercial_area = f"around:{FootTrafficEstimator.COMMERCIAL_RADIUS},{lat},{lon}"
+            statements += [
+                f'node["public_transport"]({transport_area});',
+                f'node["railway"="station"]({transport_area});',
+                f'node["amenity"="bus_station"]({transport_area});',
+                f'way["building"="residential"]({residential_area});',
+                f'way["building"="apartments"]({residential_area});',
+                f'node["shop"]({commercial_area});',
+                f'node["amenity"~"^(restaurant|cafe|fast_food|bar)$"]({commercial_area});',
+            ]
+        
+        body = "\n  ".join(statements)
+        query = f"""
+[out:json][timeout:25];
+(
+  {body}
+);
+out center tags;
+"""
+        response = overpass.post(data=query, timeout=30)
+        response.raise_for_status()
+        
+        reference_lat = points[0][0]
+        transport = SpatialGrid(FootTrafficEstimator.TRANSPORT_RADIUS, reference_lat)
+        residential = SpatialGrid(FootTrafficEstimator.RESIDENTIAL_RADIUS, reference_lat)
+        commercial = SpatialGrid(FootTrafficEstimator.COMMERCIAL_RADIUS, reference_lat)
+        
+        for element in response.json().get('elements', []):
+            if 'lat' in element and 'lon' in element:
+                lat, lon = element['lat'], element['lon']
+            elif 'center' in element:
+                lat, lon = element['center']['lat'], element['center']['lon']
+            else:
+                continue
+            
+            tags = element.get('tags', {})
+            if element.get('type') == 'way':
+                if tags.get('building') in ('residential', 'apartments'):
+                    residential.insert(lat, lon)
+                continue
+            
+            if 'public_transport' in tags or tags.get('railway') == 'station' or tags.get('amenity') == 'bus_station':
+                transport.insert(lat, lon)
+            if 'shop' in tags or tags.get('amenity') in ('restaurant', 'cafe', 'fast_food', 'bar'):
+                commercial.insert(lat, lon)
+        
+        return transport, residential, commercial
     
     @staticmethod
     def _get_category_score(category: str) -> int:
         """Assign score based on business category"""
-        high_traffic_categories = ['mall', 'shopping', 'restaurant', 'fast_food', 'cinema']
-        medium_traffic_categories = ['gym', 'hospital', 'school', 'office']
+        # Matches both OSM tag values and the display categories from _determine_detailed_category
+        high_traffic_categories = ['mall', 'shopping', 'restaurant', 'fast_food', 'fast food', 'cinema']
+        medium_traffic_categories = ['gym', 'hospital', 'healthcare', 'school', 'educational', 'office']
         
         category_lower = category.lower()
         
@@ -151,59 +158,60 @@ class FootTrafficEstimator:
         return 0
 
 class LocationFinderService:
-    def __init__(self):
-        try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-        except Exception as e:
-            print(f"Failed to initialize Gemini AI: {str(e)}")
-            self.model = None
+    # Set once a search on this instance has fallen back to _fallback_search
+    used_fallback = False
     
-    def validate_zip_code(self, zip_code: str) -> bool:
-        """Validate if zip code exists using OpenStreetMap"""
+    def resolve_zip_code(self, zip_code: str) -> Optional[Tuple[float, float]]:
+        """Validate a zip code and return its coordinates in one call"""
+        index = get_zip_index()
+        if index is not None:
+            coords = index.lookup(zip_code)
+            if coords:
+                return coords
+        
+        # Not in the offline index: ask Nominatim, remembering ZIPs that don't exist
+        zip_key = cache_key('locator', 'zip', zip_code)
+        cached = cache.get(zip_key)
+        if cached is not None:
+            return tuple(cached) if cached else None
+        
         try:
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': f"{zip_code}, USA",
-                'format': 'json',
-                'countrycodes': 'us',
-                'limit': 1
-            }
-            headers = {'User-Agent': 'VendingLocationFinder/1.0'}
-            
-            response = requests.get(url, params=params, headers=headers, timeout=15)
+            response = nominatim.get('search', params=self._zip_search_params(zip_code), timeout=15)
             response.raise_for_status()
             
-            data = response.json()
-            return len(data) > 0
+            coords = self._coords_from_search(response.json())
+            cache.set(zip_key, coords or False, self._zip_cache_ttl(coords))
+            return coords
             
         except Exception as e:
-            print(f"Zip code validation error: {str(e)}")
-            return False
+            print(f"Zip code lookup error: {str(e)}")
+            return None
+    
+    def _zip_search_params(self, zip_code: str) -> Dict:
+        return {
+            'q': f"{zip_code}, USA",
+            'format': 'json',
+            'countrycodes': 'us',
+            'limit': 1
+        }
+    
+    def _coords_from_search(self, data: List[Dict]) -> Optional[Tuple[float, float]]:
+        if data:
+            return float(data[0]['lat']), float(data[0]['lon'])
+        return None
+    
+    def _zip_cache_ttl(self, coords: Optional[Tuple[float, float]]) -> int:
+        if coords:
+            return getattr(settings, 'ZIP_LOOKUP_CACHE_TTL', 60 * 60 * 24 * 30)
+        return getattr(settings, 'ZIP_NEGATIVE_CACHE_TTL', 60 * 60 * 24)
+    
+    def validate_zip_code(self, zip_code: str) -> bool:
+        """Validate if zip code exists"""
+        return self.resolve_zip_code(zip_code) is not None
     
     def get_coordinates_from_zip(self, zip_code: str) -> Optional[Tuple[float, float]]:
         """Get latitude and longitude from zip code"""
-        try:
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': f"{zip_code}, USA",
-                'format': 'json',
-                'countrycodes': 'us',
-                'limit': 1
-            }
-            headers = {'User-Agent': 'VendingLocationFinder/1.0'}
-            
-            response = requests.get(url, params=params, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data:
-                return float(data[0]['lat']), float(data[0]['lon'])
-            return None
-            
-        except Exception as e:
-            print(f"Coordinates error: {str(e)}")
-            return None
+        return self.resolve_zip_code(zip_code)
     
     # def find_nearby_places(self, lat: float, lon: float, machine_type: str) -> List[Dict]:
     #     """Find nearby places suitable for vending machines"""
@@ -431,118 +439,185 @@ class LocationFinderService:
     #         print(f"Find nearby places error: {str(e)}")
     #         return self._fallback_search(lat, lon)
 
-    def find_nearby_places(self, lat: float, lon: float, machine_type: str, radius_miles: int = 5) -> List[Dict]:
+    def find_nearby_places(self, lat: float, lon: float, machine_type: str, radius_miles: int = 5,
+                           on_progress: Optional[Callable[[str, int], None]] = None) -> List[Dict]:
 
-        """Find nearby places suitable for vending machines"""
+        """Find nearby places suitable for vending machines
+        
+        on_progress, if given, is called with a stage description and a 0-100 percentage.
+        """
+        report = on_progress or (lambda stage, percent: None)
         try:
             # Convert miles to meters
             radius = radius_miles * 1609  # 1 mile = 1609 meters
             
-            # Define place types based on machine type
-            if machine_type == "Snack & Drink Machines":
-                place_types = {
-                    "amenity": ["school", "university", "hospital", "office"],
-                    "leisure": ["fitness_centre"],
-                    "building": ["office"]
-                }
-            elif machine_type == "Claw Machine":
-                place_types = {
-                    "amenity": ["cinema", "restaurant", "fast_food", "cafe"],
-                    "leisure": ["bowling_alley", "amusement_arcade"],
-                    "shop": ["mall"]
-                }
-            elif machine_type == "Cotton Candy Machines":
-                place_types = {
-                    "amenity": ["cinema", "theatre"],
-                    "leisure": ["amusement_arcade", "park"],
-                    "shop": ["mall"]
-                }
-            elif machine_type == "Hot Dog Vending":
-                place_types = {
-                    "amenity": ["university", "school", "hospital"],
-                    "leisure": ["stadium", "sports_centre"],
-                    "building": ["office"]
-                }
-            elif machine_type == "Fresh Food Market Machines":
-                place_types = {
-                    "amenity": ["hospital", "university", "office"],
-                    "building": ["office"],
-                    "leisure": ["fitness_centre"]
-                }
-            else:
-                # Default fallback
-                place_types = {
-                    "amenity": ["school", "restaurant", "cafe"],
-                    "leisure": ["fitness_centre"],
-                    "shop": ["mall"]
-                }
+            place_types = self._get_place_types(machine_type)
             
-            all_places = []
-            
-            for key, values in place_types.items():
-                for value in values:
-                    try:
-                        query = f"""
-                        [out:json][timeout:25];
-                        (
-                            node["{key}"="{value}"](around:{radius},{lat},{lon});
-                            way["{key}"="{value}"](around:{radius},{lat},{lon});
-                        );
-                        out center meta;
-                        """
-                        
-                        response = requests.post(
-                            "https://overpass-api.de/api/interpreter",
-                            data=query,
-                            timeout=30
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            
-                            for element in data.get('elements', [])[:2]:  # Limit to 2 per type
-                                name = element.get('tags', {}).get('name', 'Unknown Location')
-                                if name == 'Unknown Location':
-                                    continue
-                                
-                                # Get coordinates
-                                if 'lat' in element and 'lon' in element:
-                                    place_lat, place_lon = element['lat'], element['lon']
-                                elif 'center' in element:
-                                    place_lat, place_lon = element['center']['lat'], element['center']['lon']
-                                else:
-                                    continue
-                                
-                                tags = element.get('tags', {})
-                                
-                                place_info = {
-                                    'name': name,
-                                    'category': self._determine_detailed_category(tags),
-                                    'address': self._get_address_from_coords(place_lat, place_lon),
-                                    'lat': place_lat,
-                                    'lon': place_lon,
-                                    'phone': self._extract_phone(tags),
-                                    'email': self._extract_email(tags),
-                                    'business_hours': self._extract_business_hours(tags)
-                                    # Removed foot_traffic
-                                }
-                                
-                                # Avoid duplicates
-                                if not any(p['name'] == name for p in all_places):
-                                    all_places.append(place_info)
-                        
-                        time.sleep(0.5)  # Rate limiting
-                        
-                    except Exception as e:
-                        print(f"Place type search error for {key}={value}: {str(e)}")
-                        continue
+            # Served from the local POI store or cached Overpass tiles, fetching only missing or stale ones
+            report('Searching map data', 20)
+            buckets = fetch_pois(place_types, lat, lon, radius)
+            
+            places = self._select_places(buckets, place_types, machine_type, lat, lon, radius)
+            if not places:
+                report('Trying a broader search', 60)
+                return self._fallback_search(lat, lon)
             
-            # Return up to 10 places
-            return all_places[:10] if all_places else self._fallback_search(lat, lon)
+            # Reverse geocode only the places we keep, scoring foot traffic alongside
+            report('Looking up addresses', 50)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                scoring = executor.submit(self._estimate_foot_traffic, places)
+                self._resolve_addresses(places, on_resolved=lambda done: report(
+                    'Looking up addresses', 50 + 45 * done // len(places)
+                ))
+                scoring.result()
+            return self._rank_places(places, lat, lon, radius)
             
         except Exception as e:
             print(f"Find nearby places error: {str(e)}")
-            return self._fallback_search(lat, lon)     
+            return self._fallback_search(lat, lon)
+
+    def iter_nearby_places(self, lat: float, lon: float, machine_type: str, radius_miles: int = 5) -> Generator[Dict, None, Optional[List[Dict]]]:
+        """Like find_nearby_places, but yield each place as soon as its address is known
+        
+        Places are yielded with foot_traffic None while the batch estimate runs in the
+        background. The generator then returns the same dicts with their foot traffic
+        filled in, ranked as find_nearby_places would rank them.
+        """
+        try:
+            radius = radius_miles * 1609
+            place_types = self._get_place_types(machine_type)
+            buckets = fetch_pois(place_types, lat, lon, radius)
+            places = self._select_places(buckets, place_types, machine_type, lat, lon, radius)
+        except Exception as e:
+            print(f"Find nearby places error: {str(e)}")
+            places = []
+        
+        if not places:
+            # Already scored, nothing left to fill in
+            yield from self._fallback_search(lat, lon)
+            return None
+        
+        for place in places:
+            place['foot_traffic'] = None
+        
+        unknown = fill_known_addresses(places)
+        max_workers = min(getattr(settings, 'NOMINATIM_MAX_WORKERS', 4), max(len(unknown), 1))
+        with ThreadPoolExecutor(max_workers=max_workers + 1) as executor:
+            # Scores come back as a list, so nothing writes to a place while it is being streamed
+            scoring = executor.submit(
+                FootTrafficEstimator.estimate_batch,
+                [(place['lat'], place['lon'], place['category']) for place in places]
+            )
+            futures = {
+                executor.submit(self._get_address_from_coords, place['lat'], place['lon']): place
+                for place in unknown
+            }
+            # Places the catalog already knows go out first
+            for place in places:
+                if place['address']:
+                    yield place
+            for future in as_completed(futures):
+                place = futures[future]
+                place['address'] = future.result()
+                yield place
+            levels = scoring.result()
+        
+        for place, level in zip(places, levels):
+            place['foot_traffic'] = level
+        return self._rank_places(places, lat, lon, radius)
+
+    def _select_places(self, buckets: Dict[Tuple[str, str], List[Dict]], place_types: Dict[str, List[str]],
+                       machine_type: str, lat: float, lon: float, radius: int) -> List[Dict]:
+        """Pick the 10 best named, deduplicated places, at most 2 per tag filter, best first"""
+        filters = [(key, value) for key, values in place_types.items() for value in values]
+        
+        candidates = []
+        groups = []
+        for group, f in enumerate(filters):
+            for element in buckets[f]:
+                if 'name' not in element.get('tags', {}):
+                    continue
+                if 'lat' not in element and 'center' not in element:
+                    continue
+                candidates.append(element)
+                groups.append(group)
+        
+        # The same venue under several filters, or as a node and a building, counts once
+        unique = dedupe_elements(candidates, getattr(settings, 'PLACE_DEDUPE_DISTANCE', 150))
+        if not unique:
+            return []
+        
+        elements = [candidates[i] for i, _ in unique]
+        lats = np.array([e['lat'] if 'lat' in e else e['center']['lat'] for e in elements])
+        lons = np.array([e['lon'] if 'lon' in e else e['center']['lon'] for e in elements])
+        groups = np.array([groups[i] for i, _ in unique])
+        registry = get_profile_registry()
+        filter_weights = np.array([registry.weight(machine_type, key, value) for key, value in filters])
+        
+        scores = score_places(lat, lon, radius, lats, lons, filter_weights[groups])
+        best = top_k(scores, groups, per_group=2, k=10)
+        
+        places = []
+        for i in best:
+            element = elements[i]
+            tags = unique[i][1]
+            places.append({
+                'key': element_key(element.get('type', ''), element.get('id')),
+                'name': tags['name'],
+                'category': self._determine_detailed_category(tags),
+                'address': None,  # Filled in by _resolve_addresses
+                'lat': float(lats[i]),
+                'lon': float(lons[i]),
+                'phone': self._extract_phone(tags),
+                'email': self._extract_email(tags),
+                'business_hours': self._extract_business_hours(tags),
+                'foot_traffic': 'Low',  # Filled in by _estimate_foot_traffic
+                'tags': tags,
+                # The profile weight of the filter it was found under, reused by _rank_places
+                'weight': float(filter_weights[groups[i]])
+            })
+        return places
+
+    def _rank_places(self, places: List[Dict], lat: float, lon: float, radius: int) -> List[Dict]:
+        """Re-order selected places once their foot traffic is known, with the weights they were selected by"""
+        if len(places) < 2:
+            return places
+        lats = np.array([place['lat'] for place in places])
+        lons = np.array([place['lon'] for place in places])
+        filter_weights = np.array([place['weight'] for place in places])
+        scores = score_places(lat, lon, radius, lats, lons, filter_weights,
+                              traffic=[place['foot_traffic'] for place in places])
+        return [places[i] for i in np.argsort(-scores, kind='stable')]
+
+    def _estimate_foot_traffic(self, places: List[Dict]) -> None:
+        """Score every place with one batch estimate, writing the level back into its dict"""
+        levels = FootTrafficEstimator.estimate_batch(
+            [(place['lat'], place['lon'], place['category']) for place in places]
+        )
+        for place, level in zip(places, levels):
+            place['foot_traffic'] = level
+
+    def _resolve_addresses(self, places: List[Dict], on_resolved: Optional[Callable[[int], None]] = None) -> None:
+        """Fill in addresses from the place catalog, reverse geocoding the rest concurrently"""
+        unknown = fill_known_addresses(places)
+        if not unknown:
+            return
+        
+        max_workers = min(getattr(settings, 'NOMINATIM_MAX_WORKERS', 4), len(unknown))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            addresses = executor.map(
+                lambda place: self._get_address_from_coords(place['lat'], place['lon']),
+                unknown
+            )
+            for done, (place, address) in enumerate(zip(unknown, addresses), start=len(places) - len(unknown) + 1):
+                place['address'] = address
+                if on_resolved:
+                    on_resolved(done)
+
+    def _get_place_types(self, machine_type: str) -> Dict[str, List[str]]:
+        """Map a machine type to the OSM tag filters worth searching"""
+        return get_profile_registry().place_types(machine_type)
+
     def _extract_phone(self, tags: Dict) -> str:
         """Extract phone number from OSM tags"""
         phone_keys = ['phone', 'contact:phone', 'telephone']
@@ -567,51 +642,38 @@ class LocationFinderService:
     
     def _determine_detailed_category(self, tags: Dict) -> str:
         """Determine detailed category from OSM tags"""
-        if tags.get('amenity') == 'cafe':
-            return 'Cafe'
-        elif tags.get('amenity') == 'restaurant':
-            return 'Restaurant'
-        elif tags.get('amenity') == 'fast_food':
-            return 'Fast Food'
-        elif tags.get('leisure') == 'fitness_centre':
-            return 'Gym/Fitness Center'
-        elif tags.get('amenity') in ['school', 'university']:
-            return 'Educational Institution'
-        elif 'office' in tags:
-            return 'Office Building'
-        elif tags.get('amenity') == 'hospital':
-            return 'Healthcare Facility'
-        elif tags.get('shop') == 'mall':
-            return 'Shopping Mall'
-        elif tags.get('amenity') == 'cinema':
-            return 'Cinema'
-        elif tags.get('leisure') == 'bowling_alley':
-            return 'Entertainment Venue'
-        else:
-            return 'Business Location'
+        return get_profile_registry().categorize(tags)
     
     def _get_address_from_coords(self, lat: float, lon: float) -> str:
         """Get address from coordinates"""
+        cached = reverse_geocode_cache.get(lat, lon)
+        if cached is not None:
+            return cached
+        
         try:
-            url = "https://nominatim.openstreetmap.org/reverse"
             params = {
                 'lat': lat,
                 'lon': lon,
                 'format': 'json'
             }
-            headers = {'User-Agent': 'VendingLocationFinder/1.0'}
             
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = nominatim.get('reverse', params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
-            return data.get('display_name', 'Address not available')
+            address = data.get('display_name')
+            if not address:
+                return 'Address not available'
+            
+            reverse_geocode_cache.set(lat, lon, address)
+            return address
             
         except Exception:
             return 'Address not available'
     
     def _fallback_search(self, lat: float, lon: float) -> List[Dict]:
         """Fallback search using Nominatim"""
+        self.used_fallback = True
         try:
             places = []
             search_terms = ['restaurant', 'cafe', 'gym', 'office', 'school']
@@ -620,7 +682,6 @@ class LocationFinderService:
                 if len(places) >= 5:
                     break
                 
-                url = "https://nominatim.openstreetmap.org/search"
                 params = {
                     'q': term,
                     'format': 'json',
@@ -629,10 +690,9 @@ class LocationFinderService:
                     'radius': 5000,
                     'limit': 1
                 }
-                headers = {'User-Agent': 'VendingLocationFinder/1.0'}
                 
                 try:
-                    response = requests.get(url, params=params, headers=headers, timeout=15)
+                    response = nominatim.get('search', params=params, timeout=15)
                     response.raise_for_status()
                     data = response.json()
                     
@@ -641,11 +701,9 @@ class LocationFinderService:
                             break
                         
                         item_lat, item_lon = float(item['lat']), float(item['lon'])
-                        foot_traffic = FootTrafficEstimator.estimate_foot_traffic(
-                            item_lat, item_lon, term
-                        )
                         
                         places.append({
+                            'key': element_key(item.get('osm_type', ''), item.get('osm_id')),
                             'name': item.get('display_name', 'Unknown Location').split(',')[0],
                             'category': term.title(),
                             'address': item.get('display_name', 'Address not available'),
@@ -654,13 +712,14 @@ class LocationFinderService:
                             'phone': '',
                             'email': '',
                             'business_hours': '9:00-17:00',
-                            'foot_traffic': foot_traffic
+                            'foot_traffic': 'Low'
                         })
-                    
-                    time.sleep(0.5)
                 except Exception:
                     continue
             
+            # Score all results with one batch query instead of three per place
+            self._estimate_foot_traffic(places)
+            
             return places if places else [{
                 'name': 'Local Business District',
                 'category': 'Business Area',
@@ -684,4 +743,89 @@ class LocationFinderService:
                 'email': '',
                 'business_hours': '9:00-17:00',
                 'foot_traffic': 'Low'
-            }]
\ No newline at end of file
+            }]
+
+
+def recent_search_results(zip_code: str, machine_type: str, radius: int) -> Optional[List[Dict]]:
+    """Places from an identical search within SEARCH_RESULT_REUSE_WINDOW seconds, or None"""
+    window = getattr(settings, 'SEARCH_RESULT_REUSE_WINDOW', 60 * 60 * 24)
+    if window <= 0:
+        return None
+    
+    # Only original searches, so reused results can't keep extending their own freshness
+    search = SearchHistory.objects.filter(
+        zip_code=zip_code,
+        machine_type=machine_type,
+        radius=radius,
+        reused_results=False,
+        fallback_results=False,
+        results_count__gt=0,
+        created_at__gte=timezone.now() - timedelta(seconds=window)
+    ).order_by('-created_at').only('id').first()
+    if search is None:
+        return None
+    
+    locations = LocationData.objects.filter(search_history_id=search.id).select_related('place').order_by('id')
+    return [place_dict(location.place, location.foot_traffic) for location in locations] or None
+
+class SearchLimitReached(Exception):
+    pass
+
+
+class SearchReservation:
+    """Charge a search before running it, refunding the charge unless its results get recorded"""
+    
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.recorded = False
+    
+    def __enter__(self):
+        if not self.subscription.use_search():
+            raise SearchLimitReached('Search limit reached or subscription expired. Please upgrade your plan.')
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if not self.recorded:
+            self.subscription.refund_search()
+        return False
+    
+    async def __aenter__(self):
+        return await sync_to_async(self.__enter__)()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        return await sync_to_async(self.__exit__)(exc_type, exc, tb)
+    
+    def record(self, user, zip_code: str, machine_type: str, places: List[Dict],
+               radius: Optional[int] = None, reused: bool = False, fallback: bool = False) -> SearchHistory:
+        search_history = record_search(user, zip_code, machine_type, places, radius, reused, fallback)
+        self.recorded = True
+        return search_history
+
+def record_search(user, zip_code: str, machine_type: str, places: List[Dict],
+                  radius: Optional[int] = None, reused: bool = False, fallback: bool = False) -> SearchHistory:
+    """Store a search and its results in one transaction, the charge is made by SearchReservation
+    
+    Places go into the shared catalog once; the search itself only links to them.
+    """
+    with transaction.atomic():
+        search_history = SearchHistory.objects.create(
+            user=user,
+            zip_code=zip_code,
+            machine_type=machine_type,
+            radius=radius,
+            results_count=len(places),
+            reused_results=reused,
+            fallback_results=fallback
+        )
+        
+        catalog = upsert_places(places)
+        LocationData.objects.bulk_create([
+            LocationData(
+                search_history=search_history,
+                place=catalog[place_key(place)],
+                foot_traffic=place.get('foot_traffic', 'Low')
+            )
+            for place in places
+        ])
+    
+    return search_history
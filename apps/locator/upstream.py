@@ -0,0 +1,350 @@
+"""
+Shared HTTP clients for the locator's upstream services.
+
+Each upstream (Overpass, Nominatim) gets one long-lived client with its own
+keep-alive connection pool, a retry policy with jittered exponential backoff
+on connection errors, 429 and 5xx responses, and a circuit breaker that
+counts every failed attempt and fails fast while the host keeps failing.
+Connecting gets a short timeout of its own; a read that times out isn't
+retried, since the upstream already spent the caller's whole budget on it.
+
+Every upstream has a sync client (requests) for the WSGI views and an async
+client (httpx) for the ASGI search path. Both share the same circuit breaker,
+so health is tracked per host, and the same request pacer, whose schedule
+is kept in the shared cache so rate limits hold across processes.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from vending_locator.cache_keys import cache_key, state_cache
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream's circuit breaker is open or all retries failed"""
+
+
+class RequestPacer:
+    """Spaces out calls to an upstream across every process sharing the cache
+
+    The next free slot lives in the state cache, so gunicorn workers, ASGI
+    processes and search workers draw on one budget. If the cache can't be
+    reached the pacer falls back to spacing calls within this process only.
+    """
+
+    LOCK_ATTEMPTS = 50
+    LOCK_WAIT = 0.02
+
+    def __init__(self, name: str, min_interval: float):
+        self.name = name
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def reserve(self) -> float:
+        """Claim the next free slot, returns how long the caller must wait for it"""
+        try:
+            return self._reserve_shared()
+        except Exception as e:
+            print(f"{self.name} pacer cache error: {str(e)}")
+            return self._reserve_local()
+
+    def _reserve_shared(self) -> float:
+        cache = state_cache()
+        slot_key = cache_key('locator', 'pacer', self.name)
+        lock_key = f"{slot_key}:lock"
+
+        # cache.add is atomic on every backend; the lock expires on its own if a holder dies
+        for _ in range(self.LOCK_ATTEMPTS):
+            if cache.add(lock_key, 1, timeout=2):
+                break
+            time.sleep(self.LOCK_WAIT)
+        else:
+            raise UpstreamUnavailable(f"{self.name} pacer lock is contended")
+
+        try:
+            # Wall clock, the slot is compared across processes
+            now = time.time()
+            slot = max(now, cache.get(slot_key) or 0.0)
+            cache.set(slot_key, slot + self.min_interval, timeout=max(60, math.ceil(slot - now + self.min_interval)))
+            return slot - now
+        finally:
+            cache.delete(lock_key)
+
+    def _reserve_local(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        return slot - now
+
+    def wait(self):
+        """Block until the caller may send its request"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_turn(self):
+        """Async version of wait() that yields to the event loop instead of blocking"""
+        delay = await sync_to_async(self.reserve, thread_sensitive=False)()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cooldown"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: let this caller probe, push the window out for everyone else
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class BaseUpstreamClient:
+    def __init__(self, name: str, base_url: str, headers: Optional[Dict] = None,
+                 pacer: Optional[RequestPacer] = None, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+        self.pacer = pacer
+        self.retries = getattr(settings, 'UPSTREAM_RETRIES', 2)
+        self.backoff = getattr(settings, 'UPSTREAM_BACKOFF', 0.5)
+        self.max_backoff = getattr(settings, 'UPSTREAM_MAX_BACKOFF', 8.0)
+        self.connect_timeout = getattr(settings, 'UPSTREAM_CONNECT_TIMEOUT', 5.0)
+        self.pool_size = getattr(settings, 'UPSTREAM_POOL_SIZE', 10)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=getattr(settings, 'UPSTREAM_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'UPSTREAM_BREAKER_RESET', 30),
+        )
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name} circuit breaker is open")
+
+    def _should_retry(self, attempt: int) -> bool:
+        """Whether another attempt is allowed once the current one failed"""
+        self.breaker.record_failure()
+        # Stop as soon as this attempt's failure opened the breaker
+        return attempt < self.retries and self.breaker.state != 'open'
+
+    def _give_up(self, last_response, last_error) -> UpstreamUnavailable:
+        if last_error is None and last_response is not None:
+            return UpstreamUnavailable(f"{self.name} returned HTTP {last_response.status_code}")
+        return UpstreamUnavailable(f"{self.name} request failed: {str(last_error)}")
+
+    def _backoff_delay(self, attempt: int, last_response) -> float:
+        # Honour Retry-After on 429/503 when the upstream sends one
+        if last_response is not None:
+            retry_after = last_response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+
+        # Full jitter keeps workers from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class UpstreamClient(BaseUpstreamClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, path: str = '', **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str = '', **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def request(self, method: str, path: str = '', **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures; raises UpstreamUnavailable when giving up"""
+        self._check_breaker()
+        url = self._url(path)
+        last_response = last_error = None
+
+        read_timeout = kwargs.pop('timeout', None)
+        kwargs['timeout'] = (self.connect_timeout, read_timeout)
+
+        attempt = 0
+        while True:
+            if attempt:
+                time.sleep(self._backoff_delay(attempt, last_response))
+
+            if self.pacer is not None:
+                self.pacer.wait()
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout
+                last_response, last_error = None, e
+            except requests.Timeout as e:
+                self.breaker.record_failure()
+                raise self._give_up(None, e)
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                last_response, last_error = response, None
+
+            if not self._should_retry(attempt):
+                raise self._give_up(last_response, last_error)
+            attempt += 1
+
+
+class AsyncUpstreamClient(BaseUpstreamClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # httpx pools are bound to the event loop that created them, so each loop gets its own client
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            entry = self._clients.get(loop)
+            if entry is None:
+                client = httpx.AsyncClient(
+                    headers=self.headers,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+                closer = loop.create_task(self._close_on_shutdown(loop, client))
+                # Also runs when the closer is cancelled before it ever started
+                closer.add_done_callback(lambda task: self._forget(loop, task))
+                entry = self._clients[loop] = (client, closer)
+        return entry[0]
+
+    def _forget(self, loop, closer):
+        with self._clients_lock:
+            # Unless aclose() was followed by a new client for the same loop
+            if loop in self._clients and self._clients[loop][1] is closer:
+                del self._clients[loop]
+
+    async def _close_on_shutdown(self, loop, client: httpx.AsyncClient):
+        """Park until the loop shuts down, then close its client
+
+        asyncio.run(), used by uvicorn and by async_to_sync for its short lived
+        loops, cancels the tasks still pending before closing the loop, which
+        runs the finally below while the loop can still close the sockets.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            await client.aclose()
+
+    async def aclose(self):
+        """Close the running loop's client now, the next request opens a new one"""
+        with self._clients_lock:
+            entry = self._clients.get(asyncio.get_running_loop())
+        if entry is not None:
+            entry[1].cancel()
+            await asyncio.gather(entry[1], return_exceptions=True)
+
+    async def get(self, path: str = '', **kwargs) -> httpx.Response:
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path: str = '', **kwargs) -> httpx.Response:
+        return await self.request('POST', path, **kwargs)
+
+    async def request(self, method: str, path: str = '', **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures; raises UpstreamUnavailable when giving up"""
+        self._check_breaker()
+        url = self._url(path)
+        client = self._get_client()
+        last_response = last_error = None
+
+        read_timeout = kwargs.pop('timeout', None)
+        kwargs['timeout'] = httpx.Timeout(read_timeout, connect=self.connect_timeout)
+
+        attempt = 0
+        while True:
+            if attempt:
+                await asyncio.sleep(self._backoff_delay(attempt, last_response))
+
+            if self.pacer is not None:
+                await self.pacer.await_turn()
+
+            try:
+                response = await client.request(method, url, **kwargs)
+            except (httpx.ReadTimeout, httpx.WriteTimeout, httpx.PoolTimeout) as e:
+                self.breaker.record_failure()
+                raise self._give_up(None, e)
+            except httpx.TransportError as e:
+                # Includes ConnectTimeout
+                last_response, last_error = None, e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                last_response, last_error = response, None
+
+            if not self._should_retry(attempt):
+                raise self._give_up(last_response, last_error)
+            attempt += 1
+
+
+USER_AGENT = 'VendingLocationFinder/1.0'
+
+OVERPASS_URL = getattr(settings, 'OVERPASS_URL', 'https://overpass-api.de/api/interpreter')
+NOMINATIM_URL = getattr(settings, 'NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+overpass = UpstreamClient('overpass', OVERPASS_URL)
+async_overpass = AsyncUpstreamClient('overpass', OVERPASS_URL, breaker=overpass.breaker)
+
+# Nominatim usage policy: at most one request per second from the whole application,
+# paced through the shared cache so every process counts against the same budget
+nominatim_pacer = RequestPacer('nominatim', getattr(settings, 'NOMINATIM_MIN_INTERVAL', 1.0))
+nominatim = UpstreamClient(
+    'nominatim', NOMINATIM_URL, headers={'User-Agent': USER_AGENT}, pacer=nominatim_pacer
+)
+async_nominatim = AsyncUpstreamClient(
+    'nominatim', NOMINATIM_URL, headers={'User-Agent': USER_AGENT},
+    pacer=nominatim_pacer, breaker=nominatim.breaker
+)
@@ -6,5 +6,10 @@ app_name = 'locator'
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('search/', views.search_locations, name='search_locations'),
+    path('search/async/', views.search_locations_async, name='search_locations_async'),
+    path('search/jobs/', views.submit_search_job, name='submit_search_job'),
+    path('search/jobs/<int:job_id>/', views.search_job_status, name='search_job_status'),
     path('history/', views.search_history_view, name='search_history'),
+    path('history/api/', views.search_history_api, name='search_history_api'),
+    path('history/<int:search_id>/locations/', views.search_history_locations, name='search_history_locations'),
 ]
\ No newline at end of file
@@ -1,28 +1,45 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+from apps.subscriptions.middleware import get_subscription_context
 from apps.subscriptions.models import UserSubscription
-from .models import SearchHistory, LocationData
-from .services import LocationFinderService
+from apps.subscriptions.throttle import throttle
+from .models import SearchHistory, LocationData, SearchJob
+from . import history, jobs
+from .catalog import public_place
+from .profiles import get_profile_registry
+from .services import LocationFinderService, SearchLimitReached, SearchReservation, recent_search_results
+from .async_services import AsyncLocationFinderService
+import asyncio
 import json
 
 @login_required
 def dashboard_view(request):
-    try:
-        subscription = UserSubscription.objects.get(user=request.user)
-        context = {
-            'subscription': subscription,
-            'can_search': subscription.can_search(),
-            'searches_remaining': subscription.plan.searches_per_month - subscription.searches_used
-        }
-    except UserSubscription.DoesNotExist:
-        context = {
-            'subscription': None,
-            'can_search': False,
-            'searches_remaining': 0
-        }
+    subscription_context = get_subscription_context(request)
+    context = {
+        'subscription': subscription_context.subscription,
+        'can_search': subscription_context.can_search,
+        'searches_remaining': subscription_context.searches_remaining
+    }
+    
+    context['machine_types'] = get_profile_registry().machine_types
+    
+    # Wide searches run as background jobs that the dashboard polls
+    context['job_min_radius'] = getattr(settings, 'SEARCH_JOB_MIN_RADIUS', 10)
+    
+    # ASGI deployments post to the async search view, the sync view streams its results
+    if getattr(settings, 'LOCATOR_ASYNC_SEARCH', False):
+        context['search_url'] = reverse('locator:search_locations_async')
+        context['stream_search'] = False
+    else:
+        context['search_url'] = reverse('locator:search_locations')
+        context['stream_search'] = True
     
     return render(request, 'locator/dashboard.html', context)
 
@@ -129,108 +146,372 @@ def dashboard_view(request):
 #         })
 
 
+def _get_search_params(data):
+    """Read and validate search parameters, returns (zip_code, machine_type, radius, error)"""
+    zip_code = data.get('zip_code', '').strip()
+    machine_type = data.get('machine_type', '')
+    radius = data.get('radius', '')
+    
+    if not zip_code or not machine_type or not radius:
+        return zip_code, machine_type, radius, 'Please provide zip code, machine type, and radius.'
+    
+    if not zip_code.isdigit() or len(zip_code) != 5:
+        return zip_code, machine_type, radius, 'Please enter a valid 5-digit zip code.'
+    
+    return zip_code, machine_type, radius, None
+
+
 @login_required
 @require_POST
+@throttle('search')
 def search_locations(request):
     try:
         # Check subscription
-        try:
-            subscription = UserSubscription.objects.get(user=request.user)
-            if not subscription.can_search():
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Search limit reached or subscription expired. Please upgrade your plan.'
-                })
-        except UserSubscription.DoesNotExist:
+        subscription_context = get_subscription_context(request)
+        subscription = subscription_context.subscription
+        if subscription is None:
             return JsonResponse({
                 'success': False,
                 'error': 'No active subscription found. Please subscribe to a plan.'
             })
-        
-        # Get search parameters
-        zip_code = request.POST.get('zip_code', '').strip()
-        machine_type = request.POST.get('machine_type', '')
-        radius = request.POST.get('radius', '')
-        
-        if not zip_code or not machine_type or not radius:
+        if not subscription_context.can_search:
             return JsonResponse({
                 'success': False,
-                'error': 'Please provide zip code, machine type, and radius.'
+                'error': 'Search limit reached or subscription expired. Please upgrade your plan.'
             })
         
-        if not zip_code.isdigit() or len(zip_code) != 5:
+        # Get search parameters
+        zip_code, machine_type, radius, error = _get_search_params(request.POST)
+        if error:
             return JsonResponse({
                 'success': False,
-                'error': 'Please enter a valid 5-digit zip code.'
+                'error': error
             })
         
-        # Initialize location finder
-        finder = LocationFinderService()
+        radius = int(radius)
+        stream = request.POST.get('stream') == '1'
         
-        # Validate zip code
-        if not finder.validate_zip_code(zip_code):
+        # An identical recent search is answered from its stored results, no upstream calls
+        reused = recent_search_results(zip_code, machine_type, radius)
+        if reused:
+            if stream:
+                return _stream_search(request, subscription, zip_code, machine_type, radius, reused, reused=True)
+            with SearchReservation(subscription) as reservation:
+                reservation.record(request.user, zip_code, machine_type, reused, radius, reused=True)
             return JsonResponse({
-                'success': False,
-                'error': 'Zip code not found. Please enter a valid US zip code.'
+                'success': True,
+                'places': [public_place(place) for place in reused],
+                'searches_remaining': subscription.plan.searches_per_month - subscription.searches_used
             })
         
-        # Get coordinates
-        coords = finder.get_coordinates_from_zip(zip_code)
+        # Initialize location finder
+        finder = LocationFinderService()
+        
+        # Validate zip code and get coordinates in one lookup
+        coords = finder.resolve_zip_code(zip_code)
         if not coords:
             return JsonResponse({
                 'success': False,
-                'error': 'Unable to get coordinates for this zip code.'
+                'error': 'Zip code not found. Please enter a valid US zip code.'
             })
         
         lat, lon = coords
         
-        # Find nearby places
-        places = finder.find_nearby_places(lat, lon, machine_type, int(radius))
+        # Streaming mode: one NDJSON record per place as soon as it is ready
+        if stream:
+            places = finder.iter_nearby_places(lat, lon, machine_type, radius)
+            return _stream_search(request, subscription, zip_code, machine_type, radius, places, finder=finder)
         
-        if not places:
+        # Charge the search up front, it's refunded if nothing gets recorded
+        with SearchReservation(subscription) as reservation:
+            # Find nearby places
+            places = finder.find_nearby_places(lat, lon, machine_type, radius)
+            
+            if not places:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No suitable locations found in this area.'
+                })
+            
+            # Save search history
+            reservation.record(request.user, zip_code, machine_type, places, radius, fallback=finder.used_fallback)
+        
+        return JsonResponse({
+            'success': True,
+            'places': [public_place(place) for place in places],
+            'searches_remaining': subscription.plan.searches_per_month - subscription.searches_used
+        })
+        
+    except SearchLimitReached as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'An error occurred: {str(e)}'
+        })
+
+
+def _stream_search(request, subscription, zip_code, machine_type, radius, found_places, reused=False, finder=None):
+    """Stream places as newline-delimited JSON, ending with a summary or error record
+    
+    found_places may be a generator returning the places ranked, with their final foot
+    traffic, once exhausted. The summary then carries that traffic and order, indexed
+    by the order the places were streamed in. finder is the service producing them, read
+    once they are all in to know whether they came from the fallback search.
+    """
+    def records():
+        places = []
+        try:
+            # Also refunds the charge when the client disconnects mid-stream
+            with SearchReservation(subscription) as reservation:
+                found = iter(found_places)
+                while True:
+                    try:
+                        place = next(found)
+                    except StopIteration as stop:
+                        ranked = stop.value or places
+                        break
+                    places.append(place)
+                    yield json.dumps({'type': 'place', 'place': public_place(place)}) + '\n'
+                
+                if not places:
+                    yield json.dumps({
+                        'success': False,
+                        'error': 'No suitable locations found in this area.'
+                    }) + '\n'
+                    return
+                
+                fallback = finder is not None and finder.used_fallback
+                reservation.record(request.user, zip_code, machine_type, ranked, radius, reused=reused, fallback=fallback)
+            
+            streamed_index = {id(place): index for index, place in enumerate(places)}
+            yield json.dumps({
+                'type': 'summary',
+                'success': True,
+                'count': len(places),
+                'foot_traffic': [place['foot_traffic'] for place in places],
+                'order': [streamed_index[id(place)] for place in ranked],
+                'searches_remaining': subscription.plan.searches_per_month - subscription.searches_used
+            }) + '\n'
+        except SearchLimitReached as e:
+            yield json.dumps({
+                'success': False,
+                'error': str(e)
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({
+                'success': False,
+                'error': f'An error occurred: {str(e)}'
+            }) + '\n'
+    
+    response = StreamingHttpResponse(records(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _authenticated_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+async def _aget_subscription(user):
+    try:
+        return await UserSubscription.objects.with_usage().select_related('plan').aget(user=user)
+    except UserSubscription.DoesNotExist:
+        return None
+
+
+@throttle('search')
+async def search_locations_async(request):
+    """search_locations for ASGI deployments: upstream calls never block a worker"""
+    # login_required and require_POST only wrap sync views on Django 4.2
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    try:
+        zip_code, machine_type, radius, error = _get_search_params(request.POST)
+        finder = AsyncLocationFinderService()
+        
+        # The subscription check and result reuse lookup are independent, run them together
+        if error:
+            subscription, reused = await _aget_subscription(user), None
+        else:
+            radius = int(radius)
+            subscription, reused = await asyncio.gather(
+                _aget_subscription(user),
+                sync_to_async(recent_search_results)(zip_code, machine_type, radius)
+            )
+        
+        if subscription is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'No active subscription found. Please subscribe to a plan.'
+            })
+        if not subscription.can_search():
+            return JsonResponse({
+                'success': False,
+                'error': 'Search limit reached or subscription expired. Please upgrade your plan.'
+            })
+        if error:
             return JsonResponse({
                 'success': False,
-                'error': 'No suitable locations found in this area.'
+                'error': error
             })
         
-        # Use search credit
-        subscription.use_search()
-        
-        # Save search history
-        search_history = SearchHistory.objects.create(
-            user=request.user,
-            zip_code=zip_code,
-            machine_type=machine_type,
-            results_count=len(places)
-        )
-        
-        # Save location data (remove foot_traffic)
-        for place in places:
-            LocationData.objects.create(
-                search_history=search_history,
-                name=place['name'],
-                category=place['category'],
-                address=place['address'],
-                latitude=place['lat'],
-                longitude=place['lon'],
-                phone=place.get('phone', ''),
-                email=place.get('email', ''),
-                business_hours=place.get('business_hours', '')
+        # Reused results need no coordinates, so a reuse hit makes no external calls
+        if not reused:
+            coords = await finder.aresolve_zip_code(zip_code)
+            if not coords:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Zip code not found. Please enter a valid US zip code.'
+                })
+        
+        # Charge the search up front, it's refunded if nothing gets recorded
+        async with SearchReservation(subscription) as reservation:
+            if reused:
+                places = reused
+            else:
+                lat, lon = coords
+                places = await finder.afind_nearby_places(lat, lon, machine_type, radius)
+                
+                if not places:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'No suitable locations found in this area.'
+                    })
+            
+            await sync_to_async(reservation.record)(
+                user, zip_code, machine_type, places, radius, reused=bool(reused), fallback=finder.used_fallback
             )
         
         return JsonResponse({
             'success': True,
-            'places': places,
+            'places': [public_place(place) for place in places],
             'searches_remaining': subscription.plan.searches_per_month - subscription.searches_used
         })
         
+    except SearchLimitReached as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'An error occurred: {str(e)}'
         })
     
+@login_required
+@require_POST
+@throttle('search')
+def submit_search_job(request):
+    """Queue a search and return its job id straight away"""
+    subscription_context = get_subscription_context(request)
+    if subscription_context.subscription is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'No active subscription found. Please subscribe to a plan.'
+        })
+    if not subscription_context.can_search:
+        return JsonResponse({
+            'success': False,
+            'error': 'Search limit reached or subscription expired. Please upgrade your plan.'
+        })
+    
+    zip_code, machine_type, radius, error = _get_search_params(request.POST)
+    if error:
+        return JsonResponse({
+            'success': False,
+            'error': error
+        })
+    
+    try:
+        radius = int(radius)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Please select a valid radius.'
+        })
+    
+    job = jobs.submit_search_job(request.user, zip_code, machine_type, radius)
+    return JsonResponse({
+        'success': True,
+        'job_id': job.id,
+        'status_url': reverse('locator:search_job_status', args=[job.id])
+    })
+
+
+@login_required
+def search_job_status(request, job_id):
+    """Report a background search's progress, and its results once done"""
+    job = get_object_or_404(
+        SearchJob.objects.only('id', 'user_id', 'status', 'progress', 'stage', 'result', 'error'),
+        id=job_id,
+        user=request.user
+    )
+    
+    data = {
+        'success': job.status != SearchJob.STATUS_FAILED,
+        'job_id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'stage': job.stage
+    }
+    if job.status == SearchJob.STATUS_DONE:
+        data.update(job.result or {})
+    elif job.status == SearchJob.STATUS_FAILED:
+        data['error'] = job.error
+    
+    return JsonResponse(data)
+    
 @login_required
 def search_history_view(request):
-    searches = SearchHistory.objects.filter(user=request.user)[:10]
-    return render(request, 'locator/search_history.html', {'searches': searches})
\ No newline at end of file
+    searches, next_cursor = history.history_page(request.user, request.GET.get('cursor'))
+    return render(request, 'locator/search_history.html', {
+        'searches': searches,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor')
+    })
+
+
+@login_required
+def search_history_api(request):
+    """JSON page of the user's searches, ?cursor= continues, ?locations=1 includes stored locations"""
+    try:
+        page_size = int(request.GET.get('page_size', history.PAGE_SIZE))
+    except ValueError:
+        page_size = history.PAGE_SIZE
+    with_locations = request.GET.get('locations') == '1'
+    
+    searches, next_cursor = history.history_page(
+        request.user, request.GET.get('cursor'), page_size, with_locations=with_locations
+    )
+    return JsonResponse({
+        'success': True,
+        'searches': [history.serialize_search(search, with_locations) for search in searches],
+        'next_cursor': next_cursor
+    })
+
+
+@login_required
+def search_history_locations(request, search_id):
+    """Stored locations of one past search, loaded when the user expands it"""
+    locations = history.search_locations_for(request.user, search_id)
+    if locations is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Search not found.'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'locations': locations
+    })
\ No newline at end of file
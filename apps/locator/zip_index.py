@@ -0,0 +1,99 @@
+"""
+Offline US ZIP code centroid index.
+
+The index is a small binary file shipped with the app:
+
+    header   8s magic + uint32 record count (little-endian)
+    zips     uint32[count], sorted ascending
+    lats     int32[count], degrees * 1e5
+    lons     int32[count], degrees * 1e5
+
+It is memory-mapped on first use and searched with bisect, so a lookup is
+O(log n) without parsing or copying the file into Python objects.
+
+The shipped data/zip_centroids.bin was built with ``manage.py build_zip_index``
+from the MIT-licensed ``zipcodes`` 1.2.0 dataset (active, non-military ZIPs).
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Iterable, Optional, Tuple
+
+MAGIC = b'ZIPIDX1\x00'
+HEADER = struct.Struct('<8sI')
+COORD_SCALE = 100000
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'zip_centroids.bin')
+
+
+class ZipCentroidIndex:
+    def __init__(self, path: str):
+        if sys.byteorder != 'little':
+            raise ValueError("ZIP index can only be memory-mapped on little-endian hosts")
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ZIP centroid index")
+
+        view = memoryview(self._mmap)
+        start = HEADER.size
+        self._zips = view[start:start + 4 * count].cast('I')
+        self._lats = view[start + 4 * count:start + 8 * count].cast('i')
+        self._lons = view[start + 8 * count:start + 12 * count].cast('i')
+        self.count = count
+
+    def lookup(self, zip_code: str) -> Optional[Tuple[float, float]]:
+        """Return (lat, lon) for a 5-digit ZIP, or None if it is not indexed"""
+        if not zip_code.isdigit() or len(zip_code) != 5:
+            return None
+
+        key = int(zip_code)
+        i = bisect.bisect_left(self._zips, key)
+        if i < self.count and self._zips[i] == key:
+            return self._lats[i] / COORD_SCALE, self._lons[i] / COORD_SCALE
+        return None
+
+    def __contains__(self, zip_code: str) -> bool:
+        return self.lookup(zip_code) is not None
+
+
+def write_index(records: Iterable[Tuple[str, float, float]], path: str) -> int:
+    """Write (zip_code, lat, lon) records to a binary index file, returns the record count"""
+    rows = {}
+    for zip_code, lat, lon in records:
+        rows[int(zip_code)] = (round(lat * COORD_SCALE), round(lon * COORD_SCALE))
+
+    keys = sorted(rows)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(struct.pack(f'<{len(keys)}I', *keys))
+        f.write(struct.pack(f'<{len(keys)}i', *(rows[k][0] for k in keys)))
+        f.write(struct.pack(f'<{len(keys)}i', *(rows[k][1] for k in keys)))
+    return len(keys)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_zip_index() -> Optional[ZipCentroidIndex]:
+    """Return the process-wide index, or None if the data file is unavailable"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from django.conf import settings
+                path = getattr(settings, 'ZIP_INDEX_PATH', DEFAULT_INDEX_PATH)
+                try:
+                    _index = ZipCentroidIndex(path)
+                except (OSError, ValueError) as e:
+                    print(f"ZIP index unavailable: {str(e)}")
+                    _index = False
+    return _index or None
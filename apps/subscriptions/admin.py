@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription, PaymentHistory
+from .models import SubscriptionPlan, UserSubscription, UsageEvent, PaymentHistory
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'searches_per_month', 'script_templates', 'regeneration_allowed']
+    list_display = ['name', 'price', 'searches_per_month', 'script_templates', 'regeneration_allowed',
+                    'requests_per_minute', 'request_burst']
+    list_editable = ['requests_per_minute', 'request_burst']
     list_filter = ['regeneration_allowed']
     search_fields = ['name']
 
@@ -12,7 +14,17 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     list_display = ['user', 'plan', 'start_date', 'end_date', 'is_active', 'searches_used']
     list_filter = ['plan', 'is_active', 'start_date']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['start_date']
+    readonly_fields = ['start_date', 'rolled_up_searches', 'usage_rolled_up_to', 'period_start']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_usage()
+
+@admin.register(UsageEvent)
+class UsageEventAdmin(admin.ModelAdmin):
+    list_display = ['subscription', 'kind', 'amount', 'created_at']
+    list_filter = ['kind', 'created_at']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['subscription']
 
 @admin.register(PaymentHistory)
 class PaymentHistoryAdmin(admin.ModelAdmin):
@@ -0,0 +1,6 @@
+from .middleware import get_subscription_context
+
+
+def subscription(request):
+    """Expose the request's subscription to templates; nothing is queried unless a template uses it"""
+    return {'subscription_context': get_subscription_context(request)}
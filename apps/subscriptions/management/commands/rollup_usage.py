@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.subscriptions.services import rollup_usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold usage ledger events into each subscription's rolled up counter, "
+        "keeping the per-request usage query short. Meant to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delay',
+            type=int,
+            default=60,
+            help='Leave events younger than this many seconds for the next run'
+        )
+
+    def handle(self, *args, **options):
+        updated = rollup_usage(options['delay'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up usage for {updated} subscriptions"))
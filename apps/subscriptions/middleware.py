@@ -0,0 +1,57 @@
+from typing import Optional
+
+from django.utils.functional import cached_property
+
+from .models import UserSubscription
+
+
+class SubscriptionContext:
+    """The user's subscription and plan, loaded with one query the first time anything asks for them"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def subscription(self) -> Optional[UserSubscription]:
+        if not self.user.is_authenticated:
+            return None
+        try:
+            return UserSubscription.objects.with_usage().select_related('plan').get(user=self.user)
+        except UserSubscription.DoesNotExist:
+            return None
+
+    # Derived from the loaded rows, so they stay right after use_search() and never query again
+    @property
+    def is_active(self) -> bool:
+        subscription = self.subscription
+        return subscription is not None and subscription.is_active and not subscription.is_expired()
+
+    @property
+    def can_search(self) -> bool:
+        return self.subscription is not None and self.subscription.can_search()
+
+    @property
+    def searches_remaining(self) -> int:
+        subscription = self.subscription
+        if subscription is None:
+            return 0
+        return subscription.plan.searches_per_month - subscription.searches_used
+
+
+class SubscriptionMiddleware:
+    """Give every request a lazy request.subscription_context"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.subscription_context = SubscriptionContext(request.user)
+        return self.get_response(request)
+
+
+def get_subscription_context(request) -> SubscriptionContext:
+    """The request's SubscriptionContext, created on the spot when the middleware isn't installed"""
+    context = getattr(request, 'subscription_context', None)
+    if context is None:
+        context = request.subscription_context = SubscriptionContext(request.user)
+    return context
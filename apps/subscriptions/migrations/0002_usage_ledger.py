@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="usersubscription",
+            old_name="searches_used",
+            new_name="rolled_up_searches",
+        ),
+        migrations.AddField(
+            model_name="usersubscription",
+            name="period_start",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="usersubscription",
+            name="usage_rolled_up_to",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="UsageEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("search", "Search"), ("script", "Script")],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.SmallIntegerField(default=1)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "subscription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="usage_events",
+                        to="subscriptions.usersubscription",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["subscription", "kind", "id"],
+                        name="subscriptio_subscri_187c3e_idx",
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="subscriptio_created_96d5e7_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
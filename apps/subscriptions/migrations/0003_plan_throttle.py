@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0002_usage_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriptionplan",
+            name="request_burst",
+            field=models.PositiveIntegerField(default=3),
+        ),
+        migrations.AddField(
+            model_name="subscriptionplan",
+            name="requests_per_minute",
+            field=models.PositiveIntegerField(default=10),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from datetime import datetime, timedelta
 
 class SubscriptionPlan(models.Model):
@@ -17,19 +20,38 @@ class SubscriptionPlan(models.Model):
     script_templates = models.IntegerField()
     regeneration_allowed = models.BooleanField(default=False)
     description = models.TextField()
+    # Token bucket for searches and script generation, see apps.subscriptions.throttle; 0 turns it off
+    requests_per_minute = models.PositiveIntegerField(default=10)
+    request_burst = models.PositiveIntegerField(default=3)
     
     def __str__(self):
         return f"{self.get_name_display()} - ${self.price}/month"
 
+class UserSubscriptionQuerySet(models.QuerySet):
+    def with_usage(self):
+        """Annotate the searches not rolled up yet, so searches_used needs no query of its own"""
+        pending = UsageEvent.objects.filter(
+            subscription=OuterRef('pk'),
+            kind=UsageEvent.SEARCH,
+            id__gt=OuterRef('usage_rolled_up_to')
+        ).order_by().values('subscription').annotate(total=Sum('amount')).values('total')
+        return self.annotate(pending_searches=Coalesce(Subquery(pending), 0))
+
 class UserSubscription(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE)
     start_date = models.DateTimeField(auto_now_add=True)
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
-    searches_used = models.IntegerField(default=0)
+    # Usage lives in the UsageEvent ledger; these hold its rolled up total for the current period
+    # and the id of the last event counted in it, see rollup_usage()
+    rolled_up_searches = models.IntegerField(default=0)
+    usage_rolled_up_to = models.BigIntegerField(default=0)
+    period_start = models.DateTimeField(default=timezone.now)
     paypal_subscription_id = models.CharField(max_length=100, blank=True)
     
+    objects = UserSubscriptionQuerySet.as_manager()
+    
     #def save(self, *args, **kwargs):
     def save(self, *args, **kwargs):
         if not self.end_date:
@@ -44,19 +66,87 @@ class UserSubscription(models.Model):
         from django.utils import timezone
         return timezone.now() > self.end_date
         
+    @property
+    def searches_used(self):
+        """Searches this period: the rolled up total plus the ledger events after it"""
+        if getattr(self, 'pending_searches', None) is None:
+            self.pending_searches = self._pending_searches()
+        return self.rolled_up_searches + self.pending_searches
+    
+    def _pending_searches(self, up_to=None):
+        events = UsageEvent.objects.filter(subscription_id=self.pk, kind=UsageEvent.SEARCH, id__gt=self.usage_rolled_up_to)
+        if up_to is not None:
+            events = events.filter(id__lte=up_to)
+        return events.aggregate(total=Sum('amount'))['total'] or 0
+        
     def can_search(self):
         return self.is_active and not self.is_expired() and self.searches_used < self.plan.searches_per_month
     
     def use_search(self):
-        if self.can_search():
-            self.searches_used += 1
-            self.save()
-            return True
-        return False
+        # Insert first, then count only the events ordered before ours: of two searches racing for
+        # the last one exactly one stays within the limit, and the other takes its charge back
+        if not self.can_search():
+            return False
+        event = UsageEvent.objects.create(subscription=self, kind=UsageEvent.SEARCH)
+        pending = self._pending_searches(up_to=event.id)
+        if self.rolled_up_searches + pending > self.plan.searches_per_month:
+            UsageEvent.objects.create(subscription=self, kind=UsageEvent.SEARCH, amount=-1)
+            self.pending_searches = None
+            return False
+        self.pending_searches = pending
+        return True
+    
+    def refund_search(self):
+        if self.searches_used <= 0:
+            return False
+        UsageEvent.objects.create(subscription=self, kind=UsageEvent.SEARCH, amount=-1)
+        self.pending_searches -= 1
+        return True
+    
+    def record_usage(self, kind):
+        """Log usage that isn't limited, such as a generated script"""
+        UsageEvent.objects.create(subscription=self, kind=kind)
+    
+    def start_new_period(self):
+        """Reset usage by moving the rollup boundary past every event so far, without touching the ledger"""
+        last_event = UsageEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        now = timezone.now()
+        UserSubscription.objects.filter(pk=self.pk).update(
+            rolled_up_searches=0, usage_rolled_up_to=last_event, period_start=now
+        )
+        self.rolled_up_searches = 0
+        self.usage_rolled_up_to = last_event
+        self.period_start = now
+        self.pending_searches = None
     
     def __str__(self):
         return f"{self.user.username} - {self.plan.name}"
 
+class UsageEvent(models.Model):
+    SEARCH = 'search'
+    SCRIPT = 'script'
+    KIND_CHOICES = [
+        (SEARCH, 'Search'),
+        (SCRIPT, 'Script'),
+    ]
+    
+    # Append-only: a refund is another event with amount -1
+    subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name='usage_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    amount = models.SmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # Summing a subscription's events after its rollup boundary
+            models.Index(fields=['subscription', 'kind', 'id']),
+            # Per-day usage and the rollup cutoff
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subscription_id} {self.kind} {self.amount:+d}"
+
 class PaymentHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE)
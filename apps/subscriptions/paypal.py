@@ -0,0 +1,27 @@
+"""
+PayPal SDK, imported and configured on first use.
+
+Only the subscribe and payment return views need it, so workers don't pay
+for importing paypalrestsdk at boot.
+"""
+import threading
+
+_sdk = None
+_sdk_lock = threading.Lock()
+
+
+def get_paypal():
+    """Return the paypalrestsdk module, configured from settings the first time"""
+    global _sdk
+    if _sdk is None:
+        with _sdk_lock:
+            if _sdk is None:
+                from django.conf import settings
+                import paypalrestsdk
+                paypalrestsdk.configure({
+                    "mode": settings.PAYPAL_MODE,  # sandbox or live
+                    "client_id": settings.PAYPAL_CLIENT_ID,
+                    "client_secret": settings.PAYPAL_CLIENT_SECRET
+                })
+                _sdk = paypalrestsdk
+    return _sdk
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import UsageEvent, UserSubscription
+
+
+def rollup_usage(delay=60):
+    """Fold ledger events older than delay seconds into their subscription's counter, returns how many were updated"""
+    # Ids are handed out before commit, so leave recent events until any in-flight ones with lower ids are visible
+    up_to = UsageEvent.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=delay)
+    ).order_by('-id').values_list('id', flat=True).first()
+    if up_to is None:
+        return 0
+    
+    pending = UsageEvent.objects.filter(
+        subscription=OuterRef('pk'), id__gt=OuterRef('usage_rolled_up_to'), id__lte=up_to
+    )
+    updated = 0
+    for subscription in UserSubscription.objects.filter(Exists(pending)).only('id', 'rolled_up_searches', 'usage_rolled_up_to'):
+        total = subscription._pending_searches(up_to=up_to)
+        # Conditional on the old boundary, so a concurrent rollup or new period can't be counted twice
+        updated += UserSubscription.objects.filter(
+            pk=subscription.pk, usage_rolled_up_to=subscription.usage_rolled_up_to
+        ).update(
+            rolled_up_searches=F('rolled_up_searches') + total,
+            usage_rolled_up_to=up_to
+        )
+    return updated
@@ -0,0 +1,114 @@
+"""
+Per-user token bucket throttling for expensive views.
+
+Each (scope, user) pair owns a bucket in the state cache holding up to the
+plan's request_burst tokens, refilled at requests_per_minute. A request
+takes one token or is answered 429 with Retry-After before the view runs,
+so a burst of parallel POSTs can't fan out into upstream calls.
+"""
+import asyncio
+import math
+import time
+from functools import wraps
+from typing import Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from vending_locator.cache_keys import cache_key, state_cache
+
+from .middleware import get_subscription_context
+
+LOCK_ATTEMPTS = 5
+LOCK_WAIT = 0.01
+
+
+class TokenBucket:
+    def __init__(self, namespace: str = 'subscriptions'):
+        self.namespace = namespace
+
+    def take(self, key: str, rate_per_minute: int, burst: int) -> float:
+        """Take a token from the bucket, returns 0 on success or the seconds until one is available"""
+        cache = state_cache()
+        bucket_key = cache_key(self.namespace, 'throttle', key)
+        lock_key = f"{bucket_key}:lock"
+        refill = rate_per_minute / 60
+
+        # cache.add is atomic on every backend, so it serializes updates to one bucket across workers
+        for attempt in range(LOCK_ATTEMPTS):
+            if cache.add(lock_key, 1, timeout=2):
+                break
+            time.sleep(LOCK_WAIT * (attempt + 1))
+        else:
+            # Still contended: this user has other requests in flight right now
+            return 1 / refill
+
+        try:
+            now = time.time()
+            tokens, updated_at = cache.get(bucket_key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated_at) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Once it has refilled completely the bucket can expire, a missing bucket is a full one
+            cache.set(bucket_key, (tokens, now), timeout=math.ceil(burst / refill) + 1)
+            return 0 if allowed else (1 - tokens) / refill
+        finally:
+            cache.delete(lock_key)
+
+
+token_bucket = TokenBucket()
+
+
+def throttle_limits(request) -> Tuple[int, int]:
+    """(requests per minute, burst) for the request's plan, or the defaults without one"""
+    subscription = get_subscription_context(request).subscription
+    if subscription is not None:
+        return subscription.plan.requests_per_minute, subscription.plan.request_burst
+    return getattr(settings, 'THROTTLE_DEFAULT_RATE', 6), getattr(settings, 'THROTTLE_DEFAULT_BURST', 2)
+
+
+def _check(request, scope: str) -> float:
+    if not request.user.is_authenticated:
+        # The view sends these to the login page
+        return 0
+    try:
+        rate, burst = throttle_limits(request)
+        if rate <= 0 or burst <= 0:
+            return 0
+        return token_bucket.take(f"{scope}:{request.user.pk}", rate, burst)
+    except Exception as e:
+        # Never turn a cache outage into failed searches
+        print(f"Throttle error: {str(e)}")
+        return 0
+
+
+def _too_many_requests(wait: float) -> JsonResponse:
+    response = JsonResponse({
+        'success': False,
+        'error': 'Too many requests. Please wait a moment and try again.'
+    }, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def throttle(scope: str):
+    """Limit a sync or async view to its user's plan rate, one bucket per scope"""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                wait = await sync_to_async(_check)(request, scope)
+                if wait:
+                    return _too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = _check(request, scope)
+            if wait:
+                return _too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
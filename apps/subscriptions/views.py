@@ -7,21 +7,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from .middleware import get_subscription_context
 from .models import SubscriptionPlan, UserSubscription, PaymentHistory
-import paypalrestsdk
-from django.conf import settings
+from .paypal import get_paypal
 
 
 def plans_view(request):
     plans = SubscriptionPlan.objects.all().order_by('price')
     return render(request, 'subscriptions/plans.html', {'plans': plans})
 
-# Configure PayPal
-paypalrestsdk.configure({
-    "mode": settings.PAYPAL_MODE,  # sandbox or live
-    "client_id": settings.PAYPAL_CLIENT_ID,
-    "client_secret": settings.PAYPAL_CLIENT_SECRET
-})
 
 
 
@@ -111,13 +105,10 @@ def subscribe_view(request, plan_id):
     plan = get_object_or_404(SubscriptionPlan, id=plan_id)
     
     # Check if user already has this plan
-    try:
-        current_subscription = UserSubscription.objects.get(user=request.user)
-        if current_subscription.plan.id == plan_id:
-            messages.error(request, f'You are already subscribed to the {plan.get_name_display()} plan!')
-            return redirect('subscriptions:plans')
-    except UserSubscription.DoesNotExist:
-        current_subscription = None
+    current_subscription = get_subscription_context(request).subscription
+    if current_subscription is not None and current_subscription.plan_id == plan_id:
+        messages.error(request, f'You are already subscribed to the {plan.get_name_display()} plan!')
+        return redirect('subscriptions:plans')
     
     if plan.name == 'free':
         # Only allow free plan if no current subscription
@@ -134,7 +125,7 @@ def subscribe_view(request, plan_id):
     
     # For paid plans - PayPal integration
     try:
-        payment = paypalrestsdk.Payment({
+        payment = get_paypal().Payment({
             "intent": "sale",
             "payer": {"payment_method": "paypal"},
             "redirect_urls": {
@@ -189,7 +180,7 @@ def payment_success(request):
     
     if payment_id and payer_id and plan_id:
         try:
-            payment = paypalrestsdk.Payment.find(payment_id)
+            payment = get_paypal().Payment.find(payment_id)
             if payment.execute({"payer_id": payer_id}):
                 plan = get_object_or_404(SubscriptionPlan, id=plan_id)
                 
@@ -200,9 +191,10 @@ def payment_success(request):
                 )
                 if not created:
                     subscription.plan = plan
-                    subscription.searches_used = 0
                     subscription.is_active = True
-                    subscription.save()
+                    subscription.save(update_fields=['plan', 'is_active'])
+                    # Usage resets by moving the ledger's rollup boundary
+                    subscription.start_new_period()
                 
                 messages.success(request, f'Successfully subscribed to {plan.get_name_display()} plan!')
                 return redirect('locator:dashboard')
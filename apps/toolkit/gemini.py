@@ -0,0 +1,30 @@
+"""
+Process-wide Gemini model, imported and configured on first use.
+
+google.generativeai pulls in grpc and protobuf, a large share of a worker's
+boot time, so it isn't imported until a script is actually generated. The
+configured model is then shared by every request in the process.
+"""
+import threading
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_gemini_model():
+    """Return the shared GenerativeModel, or None if Gemini can't be set up"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from django.conf import settings
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    _model = genai.GenerativeModel(GEMINI_MODEL)
+                except Exception as e:
+                    print(f"Failed to initialize Gemini AI: {str(e)}")
+                    _model = False
+    return _model or None
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("toolkit", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="generatedscript",
+            index=models.Index(
+                fields=["user", "-created_at"], name="toolkit_gen_user_id_5f1a45_idx"
+            ),
+        ),
+    ]
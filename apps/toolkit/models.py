@@ -18,6 +18,10 @@ class GeneratedScript(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Script lists are always one user's, newest first
+            models.Index(fields=['user', '-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.script_type} - {self.location_name}"
\ No newline at end of file
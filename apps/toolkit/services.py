@@ -1,14 +1,9 @@
-import google.generativeai as genai
-from django.conf import settings
+from .gemini import get_gemini_model
 
 class ScriptGeneratorService:
     def __init__(self):
-        try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-        except Exception as e:
-            print(f"Failed to initialize Gemini AI: {str(e)}")
-            self.model = None
+        # Imported, configured and built once per process, on the first script
+        self.model = get_gemini_model()
     
     def generate_cold_call_script(self, location_name: str, category: str, machine_type: str) -> str:
         """Generate a tailored cold call script"""
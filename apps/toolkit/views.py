@@ -3,7 +3,9 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import GeneratedScript
-from apps.subscriptions.models import UserSubscription  # Add this import
+from apps.subscriptions.middleware import get_subscription_context
+from apps.subscriptions.models import UsageEvent
+from apps.subscriptions.throttle import throttle
 
 @login_required
 def toolkit_dashboard(request):
@@ -30,18 +32,13 @@ def toolkit_dashboard(request):
 
 @login_required
 @require_POST
+@throttle('script')
 def generate_script(request):
     """Generate a sales script"""
     try:
         # Check subscription
-        try:
-            subscription = UserSubscription.objects.get(user=request.user)
-            if not subscription.is_active or subscription.is_expired():
-                return JsonResponse({
-                    'success': False,
-                    'error': 'No active subscription found.'
-                })
-        except UserSubscription.DoesNotExist:
+        subscription_context = get_subscription_context(request)
+        if not subscription_context.is_active:
             return JsonResponse({
                 'success': False,
                 'error': 'No active subscription found.'
@@ -84,6 +81,7 @@ def generate_script(request):
             machine_type=machine_type,
             script_content=script_content
         )
+        subscription_context.subscription.record_usage(UsageEvent.SCRIPT)
         
         return JsonResponse({
             'success': True,
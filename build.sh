@@ -9,4 +9,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # Run migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Table behind the shared cache (no-op when it exists)
+python manage.py createcachetable
\ No newline at end of file
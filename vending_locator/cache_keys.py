@@ -0,0 +1,32 @@
+"""
+Namespaced, versioned keys for the shared cache.
+
+Every key the apps keep in the cache is built by cache_key(), e.g.
+cache_key('locator', 'zip', '90210') -> 'locator:v1:zip:90210'. Bumping a
+namespace in CACHE_KEY_VERSIONS after changing what its values hold makes
+every worker ignore the old entries, which then age out through the cull
+policy instead of being read back in the wrong shape.
+
+Coordination state (throttle buckets, upstream pacing slots, the profile
+registry version) goes through state_cache(), a separate small cache that
+bulk entries can't cull.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+STATE_CACHE_ALIAS = 'state'
+
+
+def namespace_version(namespace: str) -> int:
+    return getattr(settings, 'CACHE_KEY_VERSIONS', {}).get(namespace, 1)
+
+
+def cache_key(namespace: str, *parts) -> str:
+    return ':'.join([namespace, f"v{namespace_version(namespace)}", *(str(part) for part in parts)])
+
+
+def state_cache():
+    """The cache for coordination state, the default cache where no 'state' alias is configured"""
+    if STATE_CACHE_ALIAS in settings.CACHES:
+        return caches[STATE_CACHE_ALIAS]
+    return caches['default']
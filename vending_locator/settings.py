@@ -32,6 +32,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.subscriptions.middleware.SubscriptionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -49,6 +50,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.subscriptions.context_processors.subscription',
             ],
         },
     },
@@ -63,6 +65,47 @@ DATABASES = {
     }
 }
 
+# Shared by every worker and process with no extra service to run; build.sh creates the
+# tables (manage.py createcachetable). Once a table is full, a set first drops expired
+# entries, then 1/CULL_FREQUENCY of the rest. Every set also counts the table's rows, so
+# the two kinds of data live apart:
+# - default: bulk, re-fetchable data (POI tiles, reverse geocodes, ZIP lookups). A searched
+#   area is at most OVERPASS_TILE_MAX_PER_SEARCH tile entries kept for a week and an address
+#   one entry kept for a month, so the limit leaves room for thousands of areas and their places.
+# - state: small and hot, sessions plus the throttle buckets, upstream pacing slots and profile
+#   registry version every worker coordinates through. Bulk writes can never cull it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config('CACHE_TABLE', default='vending_locator_cache'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=300000, cast=int),
+            'CULL_FREQUENCY': config('CACHE_CULL_FREQUENCY', default=4, cast=int),
+        },
+    },
+    'state': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config('STATE_CACHE_TABLE', default='vending_locator_state'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('STATE_CACHE_MAX_ENTRIES', default=100000, cast=int),
+            'CULL_FREQUENCY': config('STATE_CACHE_CULL_FREQUENCY', default=10, cast=int),
+        },
+    },
+}
+
+# Bump a namespace to drop all of its cached values at once (see vending_locator/cache_keys.py)
+CACHE_KEY_VERSIONS = {
+    'locator': 1,
+    'toolkit': 1,
+    'subscriptions': 1,
+}
+
+# Sessions are read from the state cache, the database only backs them up
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'state'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -89,6 +132,58 @@ PAYPAL_CLIENT_ID = config('PAYPAL_CLIENT_ID', default='your-paypal-client-id')
 PAYPAL_CLIENT_SECRET = config('PAYPAL_CLIENT_SECRET', default='your-paypal-secret')
 PAYPAL_MODE = config('PAYPAL_MODE', default='sandbox')
 
+# Serve the dashboard search from the async view (set when running under ASGI)
+LOCATOR_ASYNC_SEARCH = config('LOCATOR_ASYNC_SEARCH', default=False, cast=bool)
+
+# Background search jobs (run by manage.py run_search_workers)
+SEARCH_JOB_MIN_RADIUS = config('SEARCH_JOB_MIN_RADIUS', default=10, cast=int)
+SEARCH_JOB_WORKERS = config('SEARCH_JOB_WORKERS', default=2, cast=int)
+SEARCH_JOB_TIMEOUT = config('SEARCH_JOB_TIMEOUT', default=600, cast=int)
+
+# Upstream HTTP clients (Overpass, Nominatim)
+UPSTREAM_POOL_SIZE = config('UPSTREAM_POOL_SIZE', default=10, cast=int)
+UPSTREAM_RETRIES = config('UPSTREAM_RETRIES', default=2, cast=int)
+UPSTREAM_BACKOFF = config('UPSTREAM_BACKOFF', default=0.5, cast=float)
+UPSTREAM_MAX_BACKOFF = config('UPSTREAM_MAX_BACKOFF', default=8.0, cast=float)
+# Seconds to establish a connection; the per-call timeout only bounds the read, which isn't retried
+UPSTREAM_CONNECT_TIMEOUT = config('UPSTREAM_CONNECT_TIMEOUT', default=5.0, cast=float)
+UPSTREAM_BREAKER_THRESHOLD = config('UPSTREAM_BREAKER_THRESHOLD', default=5, cast=int)
+UPSTREAM_BREAKER_RESET = config('UPSTREAM_BREAKER_RESET', default=30, cast=int)
+
+# Nominatim (reverse geocoding)
+NOMINATIM_MAX_WORKERS = config('NOMINATIM_MAX_WORKERS', default=4, cast=int)
+NOMINATIM_MIN_INTERVAL = config('NOMINATIM_MIN_INTERVAL', default=1.0, cast=float)  # seconds between requests, across all processes
+
+# Reverse geocode cache: geohash precision 8 cells are roughly 38m x 19m
+REVERSE_GEOCODE_CACHE_PRECISION = config('REVERSE_GEOCODE_CACHE_PRECISION', default=8, cast=int)
+REVERSE_GEOCODE_CACHE_TTL = config('REVERSE_GEOCODE_CACHE_TTL', default=60 * 60 * 24 * 30, cast=int)
+REVERSE_GEOCODE_CACHE_MAX_ENTRIES = config('REVERSE_GEOCODE_CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+# Overpass tile cache: 0.05 degree tiles are roughly 5.5km tall; wider searches use
+# tiles twice the size per step until they touch at most OVERPASS_TILE_MAX_PER_SEARCH
+OVERPASS_TILE_SIZE = config('OVERPASS_TILE_SIZE', default=0.05, cast=float)
+OVERPASS_TILE_MAX_PER_SEARCH = config('OVERPASS_TILE_MAX_PER_SEARCH', default=36, cast=int)
+OVERPASS_TILE_TTL = config('OVERPASS_TILE_TTL', default=60 * 60 * 24 * 7, cast=int)
+
+# POI source: 'overpass', or 'local' to answer from regions loaded with
+# manage.py import_osm_extract (Overpass still serves everything else)
+LOCATOR_POI_BACKEND = config('LOCATOR_POI_BACKEND', default='overpass')
+
+# Repeat searches (same ZIP, machine type and radius) reuse stored results this many seconds, 0 disables
+SEARCH_RESULT_REUSE_WINDOW = config('SEARCH_RESULT_REUSE_WINDOW', default=60 * 60 * 24, cast=int)
+
+# Candidates with matching names closer than this many meters are the same place
+PLACE_DEDUPE_DISTANCE = config('PLACE_DEDUPE_DISTANCE', default=150, cast=int)
+
+# Search and script throttle for users without a plan; plans carry their own limits
+THROTTLE_DEFAULT_RATE = config('THROTTLE_DEFAULT_RATE', default=6, cast=int)  # requests per minute
+THROTTLE_DEFAULT_BURST = config('THROTTLE_DEFAULT_BURST', default=2, cast=int)
+
+# ZIP lookups (offline centroid index, Nominatim only for ZIPs missing from it)
+ZIP_INDEX_PATH = os.path.join(BASE_DIR, 'apps', 'locator', 'data', 'zip_centroids.bin')
+ZIP_LOOKUP_CACHE_TTL = config('ZIP_LOOKUP_CACHE_TTL', default=60 * 60 * 24 * 30, cast=int)
+ZIP_NEGATIVE_CACHE_TTL = config('ZIP_NEGATIVE_CACHE_TTL', default=60 * 60 * 24, cast=int)
+
 # Crispy Forms
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 